@@ -0,0 +1,119 @@
+"""Listing / detail page fixtures for the benchmarks.
+
+Recorded pages live in benchmarks/fixtures/*.html (see ``record``). When a
+page has not been recorded, a synthetic page with the same structure as the
+yoozhibo site is generated instead, so the suite also runs offline.
+"""
+import os
+import random
+from datetime import date, timedelta
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SITE_ROOT = 'https://www.yoozhibo.net'
+
+TEAMS = [
+    '湖人', '勇士', '独行侠', '快船', '掘金', '太阳', '国王', '开拓者', '爵士', '雷霆',
+    '森林狼', '灰熊', '鹈鹕', '马刺', '火箭', '凯尔特人', '76人', '尼克斯', '篮网', '猛龙',
+    '雄鹿', '骑士', '公牛', '步行者', '活塞', '热火', '魔术', '老鹰', '黄蜂', '奇才',
+]
+
+QUARTERS = ['第一节', '第二节', '第三节', '第四节']
+
+# 真实页面 <head> 中有大量内联脚本和样式，解析器需要跳过
+HEAD_FILLER = '<script>' + 'var _hmt = _hmt || [];' * 2000 + '</script>' + '<style>' + '.wrap-body{margin:0 auto}' * 1500 + '</style>'
+NAV_FILLER = '<ul class="nav">' + ''.join(f'<li class="n"><a href="/lanqiu/{i}.html">频道{i}</a></li>' for i in range(300)) + '</ul>'
+
+
+def fixture_path(name):
+    return os.path.join(FIXTURE_DIR, f'{name}.html')
+
+
+def synthetic_listing(page, items_per_page=60, games_per_day=10, today=None):
+    """生成第 page 页列表，越往后日期越早"""
+    today = today or date.today()
+    rng = random.Random(page)
+    items = []
+    for index in range((page - 1) * items_per_page, page * items_per_page):
+        day = today - timedelta(days=index // games_per_day)
+        away, home = rng.sample(TEAMS, 2)
+        title = f"{day.strftime('%m月%d日')} NBA常规赛 {away} vs {home} 全场录像"
+        items.append(
+            f'<li class="c"><em>{day.strftime("%m-%d")}</em>'
+            f'<a href="/lanqiu/nba/video-{100000 + index}.html" target="_blank">{title}</a>'
+            f'<span class="tag">高清</span></li>'
+        )
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>NBA录像</title>{HEAD_FILLER}</head>'
+        f'<body><div class="header">{NAV_FILLER}</div>'
+        f'<div class="wrap-body"><div class="list"><ul>{"".join(items)}</ul></div>'
+        f'<div class="page"><a href="/lanqiu/nba/video-p{page + 1}.html">下一页</a></div></div>'
+        f'<div class="footer">{NAV_FILLER}</div></body></html>'
+    )
+
+
+def synthetic_detail(video_id=100000):
+    """生成详情页，#lx 中有每节的微博 / 微博国语 / 腾讯链接，#jj 中是集锦"""
+    replays = []
+    for index, quarter in enumerate(QUARTERS):
+        for source in ('微博', '微博国语', '腾讯'):
+            href = (f'https://weibo.com/tv/show/1034:{video_id}{index}{len(source)}' if '微博' in source
+                    else f'https://v.qq.com/x/page/{video_id}{index}.html')
+            replays.append(f'<li class="cd"><a href="{href}" target="_blank">{source} {quarter}</a></li>')
+    highlights = ''.join(
+        f'<li class="cd"><a href="https://weibo.com/tv/show/1034:{video_id}9{i}">微博 集锦{i}</a></li>'
+        for i in range(6)
+    )
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>录像</title>{HEAD_FILLER}</head>'
+        f'<body><div class="header">{NAV_FILLER}</div>'
+        f'<div class="wrap-body"><div id="lx"><ul>{"".join(replays)}</ul></div>'
+        f'<div id="jj"><ul>{highlights}</ul></div></div>'
+        f'<div class="footer">{NAV_FILLER}</div></body></html>'
+    )
+
+
+def load_listing(page):
+    """第 page 页列表页，优先使用录制的页面"""
+    path = fixture_path(f'listing-p{page}')
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    return synthetic_listing(page)
+
+
+def load_detail():
+    """详情页，优先使用录制的页面"""
+    path = fixture_path('detail')
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    return synthetic_detail()
+
+
+def record(base_url, pages=2):
+    """从线上录制列表页和第一个详情页到 benchmarks/fixtures/"""
+    import requests
+    from urllib.parse import urljoin
+    from nba_downloader.parsers import get_parser
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    session = requests.Session()
+    session.headers['User-Agent'] = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+    parser = get_parser()
+    detail_url = None
+    for page in range(1, pages + 1):
+        url = base_url.replace('-p1.html', f'-p{page}.html')
+        response = session.get(url, timeout=(5, 20))
+        response.raise_for_status()
+        with open(fixture_path(f'listing-p{page}'), 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        items = parser.listing_items(response.text)
+        if items and detail_url is None:
+            detail_url = urljoin(url, items[0][2])
+        print(f'recorded {url} ({len(items)} items)')
+    if detail_url:
+        response = session.get(detail_url, timeout=(5, 20))
+        response.raise_for_status()
+        with open(fixture_path('detail'), 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        print(f'recorded {detail_url}')
@@ -0,0 +1,253 @@
+"""Offline benchmark suite for the crawl / resolve / download pipeline.
+
+Runs get_matches, get_video_url, process_match and VideoDownloader.download
+against the fixtures in benchmarks/fixtures and a local stub CDN, prints
+pages/sec, parse time, MB/s and wall time, and compares them against
+benchmarks/baseline.json. The cold import time of the entry module is
+measured with ``python -X importtime`` in a fresh interpreter.
+
+    python -m benchmarks.run_benchmarks                  # run and compare
+    python -m benchmarks.run_benchmarks --save-baseline  # store a new baseline
+    python -m benchmarks.run_benchmarks --record         # record live fixtures first
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from benchmarks import fixtures
+from benchmarks.stub_server import StubServer
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+MB = 1024 * 1024
+
+# 这些指标越大越好，其余（耗时）越小越好
+HIGHER_IS_BETTER = ('per_sec', 'mb_s')
+
+# 只在需要时才导入的重依赖，导入入口模块时不应出现
+LAZY_MODULES = ('selenium', 'bs4', 'lxml', 'selectolax', 'tqdm')
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def make_downloader(module, stub, workdir):
+    """创建指向本地桩服务器、使用临时目录的 NBAVideoDownloader"""
+    from nba_downloader.weibo import WeiboDownloader
+
+    module.BASE_URL = f'{stub.base_url}/lanqiu/nba/video-p1.html'
+    module.DOWNLOAD_DIR = workdir
+    module.LEDGER_PATH = os.path.join(workdir, 'ledger.db')
+    module.HTTP_CACHE_DIR = None  # 每次都真正请求页面
+    module.BROWSER_MODE = 'never'
+    module.FEISHU_WEBHOOK_URL = f'{stub.base_url}/webhook'  # 通知发到桩服务器，见 stub.webhook_messages
+    module.NOTIFY_SPOOL_DIR = os.path.join(workdir, '.outbox')
+    WeiboDownloader.API_URL = f'{stub.base_url}/api/component'
+    return module.NBAVideoDownloader()
+
+
+def bench_parse(listing, detail, iterations):
+    """各解析后端解析一页的平均耗时（毫秒）"""
+    from nba_downloader import parsers
+
+    results = {}
+    backends = [name for name, available in (
+        ('bs4', True), ('lxml', parsers.LXML_AVAILABLE), ('selectolax', parsers.SELECTOLAX_AVAILABLE)
+    ) if available]
+    for name in backends:
+        for streaming in (False, True):
+            parser = parsers.get_parser(name, streaming=streaming)
+            label = f"{name}{'-stream' if streaming else ''}"
+            _, elapsed = timed(lambda: [parser.listing_items(listing) for _ in range(iterations)])
+            results[f'parse.{label}.listing_ms'] = elapsed / iterations * 1000
+            _, elapsed = timed(lambda: [parser.weibo_links(detail) for _ in range(iterations)])
+            results[f'parse.{label}.detail_ms'] = elapsed / iterations * 1000
+    return results
+
+
+def bench_get_matches(downloader, stub):
+    """抓取并解析列表页，直到按日期提前停止"""
+    listing = fixtures.load_listing(1)
+    newest = max(filter(None, (downloader.resolve_listing_date(title.split(' ')[0])
+                               for _, title, _ in downloader.parser.listing_items(listing))))
+    target_dates = downloader.get_target_dates(days=3, today=newest + timedelta(days=1))
+
+    stub.reset_counters()
+    matches, elapsed = timed(lambda: list(downloader.iter_matches(target_dates)))
+    pages = stub.requests.get('listing', 0)
+    # 再次轮询：增量模式下扫描到上次见过的条目即停止
+    _, repoll = timed(lambda: list(downloader.iter_matches(target_dates)))
+    return {
+        'get_matches.wall_s': elapsed,
+        'get_matches.pages_per_sec': pages / elapsed if elapsed else 0,
+        'get_matches.repoll_wall_s': repoll,
+    }, len(matches), pages
+
+
+def bench_get_video_url(downloader, stub, count, workers):
+    """顺序解析和并发解析详情页"""
+    urls = [f'{stub.base_url}/lanqiu/nba/video-{200000 + i}.html' for i in range(count)]
+    _, sequential = timed(lambda: [downloader.get_video_url(url) for url in urls[:count // 2]])
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        _, parallel = timed(lambda: list(executor.map(downloader.get_video_url, urls[count // 2:])))
+    half = count // 2
+    return {
+        'get_video_url.sequential_pages_per_sec': half / sequential if sequential else 0,
+        'get_video_url.parallel_pages_per_sec': (count - half) / parallel if parallel else 0,
+    }
+
+
+def bench_download(downloader, workdir, size):
+    """VideoDownloader.download 下载一个完整文件"""
+    output_dir = os.path.join(workdir, 'download')
+    video_info = {'type': 'weibo', 'url': 'https://weibo.com/tv/show/1034:bench', 'text': '微博 第一节'}
+    ok, elapsed = timed(downloader.video_downloader.download, video_info, output_dir, 'bench', '1080p')
+    if not ok:
+        raise RuntimeError('download benchmark failed')
+    return {
+        'download.wall_s': elapsed,
+        'download.mb_s': size / MB / elapsed,
+    }
+
+
+def bench_process_match(downloader, stub, workdir):
+    """process_match 下载一场比赛详情页中的全部录像"""
+    match = {'title': '湖人vs勇士', 'url': f'{stub.base_url}/lanqiu/nba/video-300000.html', 'date': '01月05日'}
+    stub.reset_counters()
+    ok, elapsed = timed(downloader.process_match, match)
+    if not ok:
+        raise RuntimeError('process_match benchmark failed')
+    return {
+        'process_match.wall_s': elapsed,
+        'process_match.mb_s': stub.bytes_sent / MB / elapsed,
+    }
+
+
+def bench_import_time(module='nba_downloader.nba_video_downloader', runs=5):
+    """在新的解释器中用 -X importtime 测量导入入口模块的耗时，返回 (指标, 被提前导入的重依赖)"""
+    best = None
+    eager = set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            capture_output=True, text=True, check=True,
+        ).stderr
+        # import time: self [us] | cumulative | imported package
+        modules = {}
+        for line in output.splitlines():
+            parts = line.split('|')
+            if line.startswith('import time:') and len(parts) == 3 and parts[1].strip().isdigit():
+                modules[parts[2].strip()] = int(parts[1])
+        cumulative = modules.get(module)
+        if cumulative is not None and (best is None or cumulative < best):
+            best = cumulative
+        eager.update(name for name in modules if name.split('.')[0] in LAZY_MODULES)
+    return {'import.cold_ms': (best or 0) / 1000}, sorted({name.split('.')[0] for name in eager})
+
+
+def compare(results, baseline, threshold):
+    """与基线比较，返回退化的指标列表"""
+    regressions = []
+    for key, value in sorted(results.items()):
+        base = baseline.get(key)
+        if not base:
+            continue
+        change = (value - base) / base
+        worse = -change if key.endswith(HIGHER_IS_BETTER) else change
+        if worse > threshold:
+            regressions.append((key, base, value, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线性能测试：页面抓取、解析和下载吞吐')
+    parser.add_argument('--size-mb', type=int, default=256, help='download 测试的文件大小（MB）')
+    parser.add_argument('--match-size-mb', type=int, default=16, help='process_match 测试中每个录像的大小（MB）')
+    parser.add_argument('--latency', type=float, default=0.02, help='桩服务器每个请求的延迟（秒）')
+    parser.add_argument('--bandwidth-mbps', type=float, default=0, help='桩服务器每个连接的限速（MB/s），0 表示不限速')
+    parser.add_argument('--detail-pages', type=int, default=40, help='get_video_url 测试的详情页数量')
+    parser.add_argument('--parse-iterations', type=int, default=20)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--threshold', type=float, default=0.2, help='超过基线多少比例视为退化')
+    parser.add_argument('--record', metavar='URL', nargs='?', const='https://www.yoozhibo.net/lanqiu/nba/video-p1.html',
+                        help='先从线上录制列表页和详情页')
+    parser.add_argument('--json', metavar='PATH', help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    if args.record:
+        fixtures.record(args.record)
+
+    from nba_downloader import nba_video_downloader as module
+    logging.getLogger().setLevel(logging.WARNING)
+
+    bandwidth = int(args.bandwidth_mbps * MB)
+    workdir = tempfile.mkdtemp(prefix='nba-bench-')
+    results = {}
+    import_metrics, eager_modules = bench_import_time()
+    results.update(import_metrics)
+    try:
+        results.update(bench_parse(fixtures.load_listing(1), fixtures.load_detail(), args.parse_iterations))
+
+        stub = StubServer(file_size=args.match_size_mb * MB, latency=args.latency, bandwidth=bandwidth).start()
+        try:
+            with make_downloader(module, stub, os.path.join(workdir, 'pages')) as downloader:
+                metrics, match_count, pages = bench_get_matches(downloader, stub)
+                results.update(metrics)
+                print(f'get_matches: {match_count} matches from {pages} listing pages')
+                results.update(bench_get_video_url(downloader, stub, args.detail_pages, module.MAX_RESOLVE_WORKERS))
+                results.update(bench_process_match(downloader, stub, workdir))
+        finally:
+            stub.stop()
+
+        stub = StubServer(file_size=args.size_mb * MB, latency=args.latency, bandwidth=bandwidth).start()
+        try:
+            with make_downloader(module, stub, os.path.join(workdir, 'download')) as downloader:
+                results.update(bench_download(downloader, workdir, args.size_mb * MB))
+        finally:
+            stub.stop()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    width = max(len(key) for key in results)
+    for key, value in sorted(results.items()):
+        print(f'{key:<{width}}  {value:10.2f}')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    # 入口模块导入重依赖与是否有基线无关，始终检查
+    if eager_modules:
+        print(f'REGRESSION import: {", ".join(eager_modules)} imported eagerly')
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f'Baseline saved to {args.baseline}')
+        return 1 if eager_modules else 0
+
+    if not os.path.exists(args.baseline):
+        print('No baseline found, run with --save-baseline to create one')
+        return 1 if eager_modules else 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for key, base, value, change in regressions:
+        print(f'REGRESSION {key}: {base:.2f} -> {value:.2f} ({change:+.0%})')
+    if not regressions and not eager_modules:
+        print(f'No regressions against {args.baseline} (threshold {args.threshold:.0%})')
+    return 1 if regressions or eager_modules else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
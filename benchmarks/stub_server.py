@@ -0,0 +1,210 @@
+"""Local HTTP stub standing in for yoozhibo, the Weibo h5 API and the Weibo CDN.
+
+Routes:
+    GET  /lanqiu/nba/video-pN.html   listing fixture page N
+    GET  /lanqiu/nba/video-ID.html   detail fixture page
+    POST /api/component              Weibo Component_Play_Playinfo response
+    GET  /stream/<oid>               synthetic video bytes (supports Range)
+    POST /webhook                    Feishu bot webhook, records the posted messages
+
+Run standalone with ``python -m benchmarks.stub_server --size-mb 300``.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from benchmarks import fixtures
+
+BLOCK = bytes((i * 31 + 7) % 256 for i in range(1024 * 1024))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 保持连接，和真实 CDN 一样可以复用
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', content_type='text/html; charset=utf-8', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+
+        path = urlparse(self.path).path
+        listing = re.match(r'^/lanqiu/nba/video-p(\d+)\.html$', path)
+        if listing:
+            server.count('listing')
+            return self._send(200, server.page(fixtures.load_listing, int(listing.group(1))))
+        if re.match(r'^/lanqiu/nba/video-\d+\.html$', path):
+            server.count('detail')
+            return self._send(200, server.page(fixtures.load_detail))
+        if path.startswith('/stream/'):
+            server.count('stream')
+            return self._stream()
+        self._send(404)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if server.latency:
+            time.sleep(server.latency)
+
+        if self.path.startswith('/api/component'):
+            server.count('api')
+            oid = re.search(r'1034(?:%3A|:)(\w+)', self.path + body.decode('utf-8', 'ignore'))
+            oid = oid.group(1) if oid else 'unknown'
+            stream = f'//{self.headers["Host"]}/stream/{oid}'
+            payload = {
+                'code': '100000',
+                'msg': 'succ',
+                'data': {'Component_Play_Playinfo': {
+                    'title': oid,
+                    'urls': {'高清 1080P': f'{stream}?q=1080', '高清 720P': f'{stream}?q=720', '标清 480P': f'{stream}?q=480'},
+                }},
+            }
+            return self._send(200, json.dumps(payload).encode('utf-8'), 'application/json')
+        if self.path.startswith('/webhook'):
+            server.count('webhook')
+            if server.take_webhook_failure():
+                return self._send(503, headers={'Retry-After': '1'})
+            server.add_webhook_message(json.loads(body or b'{}'))
+            return self._send(200, json.dumps({'code': 0, 'msg': 'success'}).encode('utf-8'), 'application/json')
+        self._send(404)
+
+    def _stream(self):
+        """按 Range 返回合成数据，按连接限速"""
+        server = self.server
+        total = server.file_size
+        start, end = 0, total - 1
+        status = 200
+        headers = {'Accept-Ranges': 'bytes'}
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else total - 1, total - 1)
+            if start >= total:
+                return self._send(416, headers={'Content-Range': f'bytes */{total}'})
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{end}/{total}'
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(end - start + 1))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+
+        began = time.monotonic()
+        sent = 0
+        position = start
+        while position <= end:
+            offset = position % len(BLOCK)
+            chunk = BLOCK[offset:offset + min(256 * 1024, end + 1 - position)]
+            try:
+                self.wfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            position += len(chunk)
+            sent += len(chunk)
+            server.add_bytes(len(chunk))
+            if server.bandwidth:
+                delay = sent / server.bandwidth - (time.monotonic() - began)
+                if delay > 0:
+                    time.sleep(delay)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, file_size=256 * 1024 * 1024, latency=0.0, bandwidth=0):
+        """bandwidth 为每个连接的限速（字节/秒），0 表示不限速"""
+        super().__init__(('127.0.0.1', port), StubHandler)
+        self.file_size = file_size
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.requests = {}
+        self.bytes_sent = 0
+        self.webhook_messages = []  # 收到的飞书消息
+        self.webhook_failures = 0  # 接下来多少次 webhook 请求返回 503
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def page(self, loader, *args):
+        """加载并缓存页面，把站内绝对链接改写到本地"""
+        key = (loader.__name__,) + args
+        with self._lock:
+            if key not in self._pages:
+                self._pages[key] = loader(*args).replace(fixtures.SITE_ROOT, self.base_url).encode('utf-8')
+            return self._pages[key]
+
+    def count(self, route):
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+    def add_bytes(self, size):
+        with self._lock:
+            self.bytes_sent += size
+
+    def take_webhook_failure(self):
+        with self._lock:
+            if self.webhook_failures > 0:
+                self.webhook_failures -= 1
+                return True
+            return False
+
+    def add_webhook_message(self, payload):
+        with self._lock:
+            self.webhook_messages.append(payload)
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = {}
+            self.bytes_sent = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='stub-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟 yoozhibo 页面、微博接口和视频 CDN')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--size-mb', type=int, default=256, help='每个视频文件的大小（MB）')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的延迟（秒）')
+    parser.add_argument('--bandwidth-mbps', type=float, default=0, help='每个连接的限速（MB/s），0 表示不限速')
+    args = parser.parse_args()
+
+    server = StubServer(args.port, args.size_mb * 1024 * 1024, args.latency, int(args.bandwidth_mbps * 1024 * 1024))
+    print(f'Stub server listening on {server.base_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 按时段取值: (开始 'HH:MM', 结束 'HH:MM', 值)，结束早于开始时表示跨午夜
+TimeProfile = Tuple[str, str, int]
+
+
+def _minutes(text: str) -> int:
+    hour, minute = text.split(':')
+    return int(hour) * 60 + int(minute)
+
+
+def value_for_time(profiles: Sequence[TimeProfile], default: int, now: Optional[datetime] = None) -> int:
+    """返回当前时段对应的值（如限速、轮询间隔），不在任何时段内时返回默认值"""
+    now = now or datetime.now()
+    current = now.hour * 60 + now.minute
+    for start, end, value in profiles:
+        start, end = _minutes(start), _minutes(end)
+        if start <= end:
+            if start <= current < end:
+                return value
+        elif current >= start or current < end:
+            return value
+    return default
+
+
+class TokenBucket:
+    """令牌桶限速器，所有下载连接共享同一个总带宽上限"""
+
+    def __init__(self, rate: int = 0):
+        self._lock = threading.Lock()
+        self.rate = 0
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate: int):
+        """调整限速，0 表示不限速；桶容量为一秒的流量"""
+        with self._lock:
+            if rate != self.rate:
+                self.rate = rate
+                self._tokens = min(self._tokens, float(rate))
+
+    def consume(self, amount: int):
+        """取走 amount 个字节的令牌，不够时等待（先透支再睡眠，长期速率不超过上限）"""
+        with self._lock:
+            if not self.rate:
+                return
+            now = time.monotonic()
+            self._tokens = min(float(self.rate), self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class DownloadScheduler:
+    """全局下载调度器
+
+    所有比赛的下载任务进入同一个优先级队列，固定数量的工作线程按优先级取任务，
+    优先级高的比赛先下完；所有连接通过 throttle 共享令牌桶限速。
+    """
+
+    _SHUTDOWN = 1  # 关闭标记排在所有任务之后
+
+    def __init__(self, max_active: int = 4, rate: int = 0, profiles: Sequence[TimeProfile] = ()):
+        self.max_active = max(max_active, 1)
+        self.default_rate = rate
+        self.profiles = list(profiles)
+        self.bucket = TokenBucket(value_for_time(self.profiles, rate))
+        self._next_rate_check = time.monotonic() + 60
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()  # 相同优先级按提交顺序
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        if self.bucket.rate:
+            logger.info(f"下载限速: {self.bucket.rate / 1024 / 1024:.1f}MB/s")
+
+    def submit(self, priority: Tuple, fn: Callable, *args) -> Future:
+        """提交下载任务，priority 越小越先执行"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('DownloadScheduler is shut down')
+            if len(self._workers) < self.max_active:
+                worker = threading.Thread(target=self._worker, name=f'download-{len(self._workers) + 1}',
+                                          daemon=True)
+                self._workers.append(worker)
+                worker.start()
+        self._queue.put((0, priority, next(self._counter), future, fn, args))
+        return future
+
+    def _worker(self):
+        while True:
+            flag, _, _, future, fn, args = self._queue.get()
+            if flag == self._SHUTDOWN:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def throttle(self, amount: int):
+        """下载连接每读取一块数据调用一次，按当前时段的限速等待"""
+        now = time.monotonic()
+        if self.profiles and now >= self._next_rate_check:
+            self._next_rate_check = now + 60
+            rate = value_for_time(self.profiles, self.default_rate)
+            if rate != self.bucket.rate:
+                logger.info(f"切换下载限速: {rate / 1024 / 1024:.1f}MB/s" if rate else "取消下载限速")
+                self.bucket.set_rate(rate)
+        self.bucket.consume(amount)
+
+    def shutdown(self, wait: bool = True):
+        """停止工作线程，已提交的任务会先执行完"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self._workers)
+        for _ in workers:
+            self._queue.put((self._SHUTDOWN, (), next(self._counter), None, None, ()))
+        if wait:
+            for worker in workers:
+                worker.join()
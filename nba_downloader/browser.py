@@ -0,0 +1,96 @@
+import logging
+import random
+import threading
+import time
+from importlib.util import find_spec
+from typing import Optional
+
+# selenium 只在第一次启动浏览器时导入，大多数运行根本不需要浏览器
+SELENIUM_AVAILABLE = find_spec('selenium') is not None
+
+logger = logging.getLogger(__name__)
+
+
+class HeadlessBrowser:
+    """按需启动、可复用的无头浏览器
+
+    第一次调用 get_page_source 时才启动 Chrome，之后所有页面复用同一个实例，
+    通过 close() 或 with 语句确定性地关闭。
+    """
+
+    def __init__(self, user_agent: str, headless: bool = True):
+        self.user_agent = user_agent
+        self.headless = headless
+        self.driver = None
+        self.available = SELENIUM_AVAILABLE  # 启动失败后置为 False，不再重试
+        if not SELENIUM_AVAILABLE:
+            logger.warning("Selenium not available, falling back to requests mode")
+        self._lock = threading.Lock()  # WebDriver 不是线程安全的
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def started(self) -> bool:
+        return self.driver is not None
+
+    def _start(self):
+        """启动 Chrome"""
+        try:
+            from selenium import webdriver
+            from selenium.webdriver.chrome.options import Options
+
+            chrome_options = Options()
+            if self.headless:
+                chrome_options.add_argument('--headless')
+            chrome_options.add_argument('--no-sandbox')
+            chrome_options.add_argument('--disable-dev-shm-usage')
+            chrome_options.add_argument('--disable-gpu')
+            chrome_options.add_argument('--window-size=1920,1080')
+            chrome_options.add_argument(f'user-agent={self.user_agent}')
+
+            # 禁用webdriver特征
+            chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+            chrome_options.add_experimental_option('useAutomationExtension', False)
+
+            self.driver = webdriver.Chrome(options=chrome_options)
+            self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+                'source': '''
+                    Object.defineProperty(navigator, 'webdriver', {
+                        get: () => undefined
+                    })
+                '''
+            })
+            logger.info("Selenium initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize Selenium: {str(e)}")
+            self.driver = None
+            self.available = False
+
+    def get_page_source(self, url: str) -> Optional[str]:
+        """用浏览器加载页面并返回渲染后的 HTML，浏览器不可用时返回 None"""
+        with self._lock:
+            if self.driver is None:
+                if not self.available:
+                    return None
+                self._start()
+                if self.driver is None:
+                    return None
+            self.driver.get(url)
+            time.sleep(random.uniform(2, 3))  # 等待页面加载
+            return self.driver.page_source
+
+    def close(self):
+        """关闭浏览器"""
+        with self._lock:
+            if self.driver:
+                try:
+                    self.driver.quit()
+                    logger.debug("Selenium closed")
+                except Exception as e:
+                    logger.debug(f"Error closing Selenium: {str(e)}")
+                finally:
+                    self.driver = None
@@ -12,6 +12,14 @@ BASE_URL = 'https://www.yoozhibo.net/lanqiu/nba/video-p1.html'
 # Days to look back for matches (default to 3 days in debug mode, 1 day in production)
 DAYS_TO_LOOK_BACK = 1
 
+# 列表页最多翻页数（按日期提前停止，通常只需要 1-2 页）
+MAX_LISTING_PAGES = 10
+BACKFILL_MAX_PAGES = 200  # 补下载（--backfill）最多翻页数，早于开始日期时提前停止
+
+# 增量扫描列表页：记住见过的列表项（详情页 URL + 标题），轮询时扫描到上次见过的条目就停止
+INCREMENTAL_LISTING = True
+LISTING_RETENTION_DAYS = 90  # 见过的列表项保留天数
+
 # Download directories
 NAS_DOWNLOAD_DIR = '/downloads'  # 对应 docker-compose.yml 中的挂载点
 LOCAL_DOWNLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'downloads')
@@ -30,6 +38,105 @@ YOU_GET_QUALITY_ARGS = {
     '480p': '--format=dash-flv480'
 }
 
+# 订阅：每个订阅有自己的球队、清晰度和下载目录，未填写的项使用上面的 TEAMS / PREFERRED_QUALITY / DOWNLOAD_DIR。
+# 列表页和详情页只抓取解析一次；清晰度相同的订阅共用一次下载，硬链接到各自的目录（跨文件系统时复制）。
+# 清晰度不同的订阅需要使用不同的下载目录。为空时只有一个使用全局配置的订阅
+PROFILES = [
+    # {'name': 'main', 'teams': ['湖人', '勇士']},
+    # {'name': 'mobile', 'teams': ['湖人'], 'quality': '720p', 'download_dir': os.path.join(DOWNLOAD_DIR, 'mobile')},
+]
+
+# 清晰度降级顺序：下载前探测链接实际提供的格式，期望清晰度没有时依次尝试更低的
+QUALITY_FALLBACK = ['1080p', '720p', '480p']
+FORMAT_CACHE_TTL = 6 * 60 * 60  # 探测结果按链接缓存的时间（秒），微博可能稍后才转码出高清
+
+# 下载后端，按顺序尝试: 'native'（进程内下载微博视频流）, 'you_get'（子进程，后备）
+DOWNLOAD_BACKENDS = ['native', 'you_get']
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 进程内下载每次读取的字节数
+DOWNLOAD_SEGMENTS = 4  # 分段下载的并发连接数，1 表示单连接；服务器不支持 Range 时自动退回单连接
+MIN_SEGMENT_SIZE = 16 * 1024 * 1024  # 每段的最小字节数，较小的文件不分段
+
+# 并发配置
+MAX_ACTIVE_DOWNLOADS = 4      # 所有比赛合计同时下载的视频数，其余按优先级（TEAMS 中的顺序）排队
+# 每个视频主机（CDN）的最大并发连接数，分段下载的每一段各占一个连接，超出的连接排队等待。
+# 所有视频通常来自同一个主机，不能小于 MAX_ACTIVE_DOWNLOADS（否则按 MAX_ACTIVE_DOWNLOADS 处理）；
+# 达到 MAX_ACTIVE_DOWNLOADS * DOWNLOAD_SEGMENTS 时不再限制分段下载
+MAX_CONNECTIONS_PER_HOST = 8
+
+# 带宽限制（只对进程内下载生效，you_get 子进程无法限速）
+BANDWIDTH_LIMIT = 0           # 总下载速度上限（字节/秒），0 表示不限速
+# 按时段限速: (开始, 结束, 字节/秒)，结束早于开始表示跨午夜，不在任何时段内时使用 BANDWIDTH_LIMIT
+BANDWIDTH_PROFILES = [
+    # ('08:00', '23:00', 4 * 1024 * 1024),
+]
+
+# 下载重试：链接失效（404 / 视频已删除）不重试，临时错误指数退避加随机抖动，限流时退避更久并遵守 Retry-After
+RETRY_MAX_ATTEMPTS = 3        # 每个视频的最大尝试次数
+RETRY_BASE_DELAY = 5          # 临时错误的初始退避（秒），每次翻倍
+RETRY_THROTTLED_DELAY = 30    # 被限流（429 / 503）时的初始退避（秒）
+RETRY_MAX_DELAY = 300         # 退避上限（秒），服务器要求等待更久时放弃本次下载并暂停该主机
+# 按主机熔断：连续失败 N 次后暂停该主机的下载，之后放行一个试探下载（0 表示不熔断）
+CIRCUIT_BREAKER_THRESHOLD = 5
+CIRCUIT_BREAKER_RESET = 300   # 暂停时间（秒）
+
+# 详情页解析配置
+MAX_RESOLVE_WORKERS = 8       # 并发解析详情页的线程数（同时也是连接池大小）
+REQUEST_TIMEOUT = (5, 20)     # 页面请求超时（连接, 读取），单位秒
+
+# 浏览器使用策略
+# 'auto': 先用 requests 获取列表页，解析不到比赛时才启动浏览器
+# 'always': 列表页总是使用浏览器获取
+# 'never': 从不启动浏览器
+BROWSER_MODE = 'auto'
+
+# 下载记录数据库（记住已完成的下载，重复运行时跳过）
+LEDGER_PATH = os.path.join(DOWNLOAD_DIR, 'nba_downloader.db')
+
+# 磁盘空间管理：下载开始前删除最早的比赛目录，并为本轮的比赛预留空间（0 表示不限制，都为 0 时不删除任何目录）
+RETENTION_MAX_BYTES = 0                          # 比赛目录总大小上限
+RETENTION_MIN_FREE_BYTES = 0                     # 下载卷的剩余空间下限，如 20 * 1024 * 1024 * 1024
+RETENTION_MAX_DIRS = 0                           # 比赛目录数上限
+
+# 下载后处理：用 ffmpeg 重新封装为 faststart MP4（只复制流，不转码），需要安装 ffmpeg
+REMUX_ENABLED = False
+REMUX_FULL_GAME = False   # 同时把各节拼接为一个全场文件: 灰熊vs勇士_全场.mp4
+MAX_REMUX_WORKERS = 1     # 后处理线程数，与后续比赛的下载同时进行
+FFMPEG_PATH = 'ffmpeg'
+
+# 页面缓存（列表页和详情页），设为 None 关闭
+HTTP_CACHE_DIR = os.path.join(DOWNLOAD_DIR, '.http_cache')
+HTTP_CACHE_TTL = 300                  # 缓存有效期（秒），过期后发送条件请求
+HTTP_CACHE_MAX_BYTES = 50 * 1024 * 1024  # 缓存总大小上限，超过时淘汰最久未访问的页面
+
+# HTML 解析后端: 'auto'（依次尝试 selectolax、lxml、BeautifulSoup）, 'selectolax', 'lxml', 'bs4'
+HTML_PARSER = 'auto'
+HTML_PARSER_STREAMING = True  # 只解析列表 / 录像链接所在的子树
+
+# 日志文件，按大小轮转；目录不可用时只输出到控制台，设为 None 不写文件
+LOG_FILE = os.path.join(DOWNLOAD_DIR, 'nba_downloader.log')
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# 运行报告（各阶段耗时、下载字节数和吞吐），设为 None 不写出
+METRICS_REPORT_PATH = os.path.join(DOWNLOAD_DIR, 'run_report.json')
+METRICS_PROMETHEUS_PATH = os.path.join(DOWNLOAD_DIR, 'nba_downloader.prom')  # node_exporter textfile collector 格式
+
+# 飞书通知：消息先写入发件箱目录，由后台线程发送，失败时退避重试，下次运行时继续发送
+FEISHU_WEBHOOK_URL = 'https://open.feishu.cn/open-apis/bot/v2/hook/453de894-fdba-4a72-aa01-21b8b756d2e1'  # 为空时不发送
+NOTIFY_SPOOL_DIR = os.path.join(DOWNLOAD_DIR, '.outbox')
+NOTIFY_TIMEOUT = (5, 10)          # 请求超时（连接, 读取），单位秒
+NOTIFY_MATCH_EVENTS = True        # 每场比赛下载完成或失败时立即通知，运行结束时仍发送汇总报告
+NOTIFY_COALESCE_DELAY = 10        # 等待多少秒把同时发生的通知合并为一条消息
+NOTIFY_FLUSH_TIMEOUT = 30         # 退出前最多等待多少秒发送剩余消息
+NOTIFY_MAX_AGE = 3 * 24 * 60 * 60  # 消息最长保留时间（秒），webhook 一直不可用时丢弃更早的消息
+
+# 常驻模式（--daemon）的轮询间隔（秒），复用会话和浏览器，不再依赖 cron
+DAEMON_POLL_INTERVAL = 2 * 60 * 60
+# 按时段的轮询间隔: (开始, 结束, 秒)，录像集中发布的时段更频繁地检查
+DAEMON_POLL_PROFILES = [
+    ('08:00', '16:00', 20 * 60),
+]
+
 # Create local video directory if it doesn't exist and in debug mode
 if DEBUG and not os.path.exists(LOCAL_DOWNLOAD_DIR):
     os.makedirs(LOCAL_DOWNLOAD_DIR)
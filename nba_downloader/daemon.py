@@ -0,0 +1,51 @@
+import logging
+import signal
+import threading
+from typing import Sequence
+
+from nba_downloader.bandwidth import TimeProfile, value_for_time
+
+logger = logging.getLogger(__name__)
+
+
+class Daemon:
+    """常驻模式：复用同一个下载器（会话、连接池、浏览器、下载记录），按配置的间隔反复运行
+
+    收到 SIGTERM / SIGINT 时取消正在进行的下载（进度保存在 .part 中），当前一轮结束后退出。
+    """
+
+    def __init__(self, downloader, interval: int, profiles: Sequence[TimeProfile] = ()):
+        self.downloader = downloader
+        self.interval = interval  # 默认轮询间隔（秒）
+        self.profiles = list(profiles)  # 按时段的轮询间隔
+        self.stop_event = threading.Event()
+
+    def install_signal_handlers(self):
+        """注册 SIGTERM / SIGINT 处理（只能在主线程调用）"""
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+
+    def _handle_signal(self, signum, frame):
+        logger.info(f"收到信号 {signal.Signals(signum).name}，保存下载进度后退出")
+        self.stop()
+
+    def stop(self):
+        """停止轮询并取消正在进行的下载"""
+        self.stop_event.set()
+        self.downloader.cancel()
+
+    def next_interval(self) -> int:
+        """当前时段的轮询间隔（秒）"""
+        return value_for_time(self.profiles, self.interval)
+
+    def run_forever(self):
+        """立即运行一次，之后按轮询间隔运行，直到被停止"""
+        logger.info("Starting daemon mode")
+        while not self.stop_event.is_set():
+            self.downloader.run(notify_idle=False)
+            if self.stop_event.is_set():
+                break
+            interval = self.next_interval()
+            logger.info(f"下次检查在 {interval / 60:.0f} 分钟后")
+            self.stop_event.wait(interval)
+        logger.info("Daemon stopped")
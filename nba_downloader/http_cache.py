@@ -0,0 +1,116 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class HttpCache:
+    """以 URL 为键的页面磁盘缓存
+
+    每个页面保存为 <sha1>.body 和 <sha1>.json（ETag / Last-Modified / 获取时间）。
+    TTL 内直接返回缓存，过期后由调用方发送条件请求，304 时继续使用缓存内容。
+    总大小超过 max_bytes 时按最近访问时间淘汰。
+    """
+
+    def __init__(self, directory: str, ttl: float = 300, max_bytes: int = 50 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: 'OrderedDict[str, int]' = OrderedDict()  # key -> body 字节数，按访问时间从旧到新
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """启动时按 body 文件的修改时间（即最近访问时间）重建 LRU 索引"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.body') and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str):
+        base = os.path.join(self.directory, key)
+        return f"{base}.body", f"{base}.json"
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """获取缓存条目，返回 {'body', 'etag', 'last_modified', 'fresh'}，没有时返回 None"""
+        key = self._key(url)
+        body_path, meta_path = self._paths(key)
+        with self._lock:
+            if key not in self._index:
+                return None
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                with open(body_path, 'r', encoding='utf-8') as f:
+                    body = f.read()
+            except (OSError, ValueError):
+                self._remove(key)
+                return None
+            self._index.move_to_end(key)
+            os.utime(body_path)  # 记录访问时间，用于重启后的 LRU 顺序
+        return {
+            'body': body,
+            'etag': meta.get('etag'),
+            'last_modified': meta.get('last_modified'),
+            'fresh': time.time() - meta.get('fetched_at', 0) < self.ttl,
+        }
+
+    def put(self, url: str, body: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """保存页面"""
+        key = self._key(url)
+        body_path, meta_path = self._paths(key)
+        data = body.encode('utf-8')
+        meta = {'url': url, 'etag': etag, 'last_modified': last_modified, 'fetched_at': time.time()}
+        with self._lock:
+            with open(body_path, 'wb') as f:
+                f.write(data)
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            self._index[key] = len(data)
+            self._index.move_to_end(key)
+            self._evict()
+
+    def refresh(self, url: str):
+        """收到 304 后刷新获取时间，重新开始计算 TTL"""
+        key = self._key(url)
+        _, meta_path = self._paths(key)
+        with self._lock:
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                meta['fetched_at'] = time.time()
+                with open(meta_path, 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, ensure_ascii=False)
+            except (OSError, ValueError):
+                self._remove(key)
+
+    def _evict(self):
+        total = sum(self._index.values())
+        while total > self.max_bytes and len(self._index) > 1:
+            key, size = next(iter(self._index.items()))
+            self._remove(key)
+            total -= size
+            logger.debug(f"Evicted cached page {key}")
+
+    def _remove(self, key: str):
+        self._index.pop(key, None)
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
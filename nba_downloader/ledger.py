@@ -0,0 +1,223 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, Any, List, Set
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadLedger:
+    """基于 SQLite 的下载记录，跨运行记住已完成的下载
+
+    以 (微博 URL, 目标路径) 为主键，记录状态、文件大小和时间戳，
+    再次运行时已完成的视频直接跳过，只重试失败的。
+    同时保存详情页解析出的视频链接，已解析完整的详情页不再重复请求；
+    以及见过的列表项（轮询时扫描到上次见过的条目就停止）和各链接可用的清晰度。
+    """
+
+    STATUS_STARTED = 'started'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS downloads (
+                    url TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    bytes INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    finished_at REAL,
+                    PRIMARY KEY (url, path)
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS resolved_links (
+                    detail_url TEXT PRIMARY KEY,
+                    links TEXT NOT NULL,
+                    resolved_at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS listing_items (
+                    fingerprint TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    href TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    date_text TEXT,
+                    item_date TEXT,
+                    position INTEGER NOT NULL DEFAULT 0,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    seen_at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS video_formats (
+                    url TEXT NOT NULL,
+                    backend TEXT NOT NULL,
+                    formats TEXT NOT NULL,
+                    probed_at REAL NOT NULL,
+                    PRIMARY KEY (url, backend)
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS listing_items_date ON listing_items (item_date)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS listing_items_url ON listing_items (url)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get(self, url: str, path: str) -> Optional[Dict[str, Any]]:
+        """获取一条下载记录"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT * FROM downloads WHERE url = ? AND path = ?', (url, path)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def is_done(self, url: str, path: str) -> bool:
+        """检查视频是否已经下载完成"""
+        record = self.get(url, path)
+        return bool(record) and record['status'] == self.STATUS_DONE
+
+    def mark_started(self, url: str, path: str):
+        """记录开始下载"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute('''
+                INSERT INTO downloads (url, path, status, attempts, created_at, updated_at)
+                VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT (url, path) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = downloads.attempts + 1,
+                    error = NULL,
+                    updated_at = excluded.updated_at
+            ''', (url, path, self.STATUS_STARTED, now, now))
+
+    def mark_done(self, url: str, path: str, size: int):
+        """记录下载完成"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute('''
+                INSERT INTO downloads (url, path, status, bytes, created_at, updated_at, finished_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url, path) DO UPDATE SET
+                    status = excluded.status,
+                    bytes = excluded.bytes,
+                    error = NULL,
+                    updated_at = excluded.updated_at,
+                    finished_at = excluded.finished_at
+            ''', (url, path, self.STATUS_DONE, size, now, now, now))
+
+    def mark_failed(self, url: str, path: str, error: str):
+        """记录下载失败"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute('''
+                INSERT INTO downloads (url, path, status, error, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url, path) DO UPDATE SET
+                    status = excluded.status,
+                    error = excluded.error,
+                    updated_at = excluded.updated_at
+            ''', (url, path, self.STATUS_FAILED, error, now, now))
+
+    def get_resolved_links(self, detail_url: str) -> Optional[List[Dict[str, Any]]]:
+        """获取详情页已解析出的视频链接"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT links FROM resolved_links WHERE detail_url = ?', (detail_url,)
+            ).fetchone()
+        return json.loads(row['links']) if row else None
+
+    def save_resolved_links(self, detail_url: str, links: List[Dict[str, Any]]):
+        """保存详情页解析出的视频链接，之后不再请求该详情页"""
+        with self._lock, self._conn:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO resolved_links (detail_url, links, resolved_at)
+                VALUES (?, ?, ?)
+            ''', (detail_url, json.dumps(links, ensure_ascii=False), time.time()))
+
+    def get_formats(self, url: str, backend: str, max_age: float) -> Optional[List[str]]:
+        """获取 max_age 秒内探测到的可用清晰度"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT formats FROM video_formats WHERE url = ? AND backend = ? AND probed_at >= ?',
+                (url, backend, time.time() - max_age)
+            ).fetchone()
+        return json.loads(row['formats']) if row else None
+
+    def save_formats(self, url: str, backend: str, formats: List[str]):
+        """保存探测到的可用清晰度"""
+        with self._lock, self._conn:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO video_formats (url, backend, formats, probed_at)
+                VALUES (?, ?, ?, ?)
+            ''', (url, backend, json.dumps(formats), time.time()))
+
+    def known_listing_items(self, fingerprints: List[str]) -> Set[str]:
+        """返回其中已经见过的列表项指纹"""
+        if not fingerprints:
+            return set()
+        placeholders = ','.join('?' * len(fingerprints))
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT fingerprint FROM listing_items WHERE fingerprint IN ({placeholders})', fingerprints
+            ).fetchall()
+        return {row['fingerprint'] for row in rows}
+
+    def add_listing_items(self, items: List[Dict[str, Any]]):
+        """保存新见到的列表项（fingerprint, url, href, title, date_text, item_date）"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany('''
+                INSERT OR IGNORE INTO listing_items
+                    (fingerprint, url, href, title, date_text, item_date, position, seen_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (item['fingerprint'], item['url'], item['href'], item['title'], item['date_text'],
+                 item['item_date'], position, now)
+                for position, item in enumerate(items)
+            ])
+
+    def pending_listing_items(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        """日期在 [start_date, end_date] 内、尚未全部下载完成的列表项，较新的在前"""
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT * FROM listing_items
+                WHERE item_date BETWEEN ? AND ? AND done = 0
+                ORDER BY item_date DESC, seen_at DESC, position
+            ''', (start_date, end_date)).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_listing_done(self, url: str):
+        """比赛已全部下载完成，之后的轮询不再处理"""
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE listing_items SET done = 1 WHERE url = ?', (url,))
+
+    def prune_listing_items(self, before: float):
+        """删除很久以前见到的列表项"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM listing_items WHERE seen_at < ?', (before,))
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
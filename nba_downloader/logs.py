@@ -0,0 +1,39 @@
+import logging
+import logging.handlers
+import os
+import queue
+from typing import Optional
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def setup_logging(log_file: Optional[str], level: int = logging.INFO, max_bytes: int = 10 * 1024 * 1024,
+                  backup_count: int = 5) -> logging.handlers.QueueListener:
+    """配置根日志：各线程只把日志放入队列，由监听线程写入控制台和按大小轮转的日志文件
+
+    磁盘或终端慢时不会阻塞下载线程。日志目录不可用时只输出到控制台。
+    返回的监听器需要在退出前 stop()，把队列中剩余的日志写完。
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    error = None
+    if log_file:
+        try:
+            os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+            handlers.append(logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+            ))
+        except OSError as e:
+            error = e
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    if error:
+        logging.getLogger(__name__).warning(f"无法写入日志文件 {log_file}，只输出到控制台: {str(error)}")
+    return listener
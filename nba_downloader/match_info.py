@@ -0,0 +1,165 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+# 球队别名表: (中文名, 城市, 英文名, 缩写, 其他别名...)，中文名为默认显示名
+TEAM_ALIASES = [
+    ('凯尔特人', '波士顿', 'Celtics', 'BOS'),
+    ('篮网', '布鲁克林', 'Nets', 'BKN'),
+    ('尼克斯', '纽约', 'Knicks', 'NYK'),
+    ('76人', '费城', '76ers', 'PHI', 'Sixers'),
+    ('猛龙', '多伦多', 'Raptors', 'TOR'),
+    ('公牛', '芝加哥', 'Bulls', 'CHI'),
+    ('骑士', '克利夫兰', 'Cavaliers', 'CLE', 'Cavs'),
+    ('活塞', '底特律', 'Pistons', 'DET'),
+    ('步行者', '印第安纳', 'Pacers', 'IND'),
+    ('雄鹿', '密尔沃基', 'Bucks', 'MIL'),
+    ('老鹰', '亚特兰大', 'Hawks', 'ATL'),
+    ('黄蜂', '夏洛特', 'Hornets', 'CHA'),
+    ('热火', '迈阿密', 'Heat', 'MIA'),
+    ('魔术', '奥兰多', 'Magic', 'ORL'),
+    ('奇才', '华盛顿', 'Wizards', 'WAS'),
+    ('掘金', '丹佛', 'Nuggets', 'DEN'),
+    ('森林狼', '明尼苏达', 'Timberwolves', 'MIN', 'Wolves'),
+    ('雷霆', '俄克拉荷马城', 'Thunder', 'OKC'),
+    ('开拓者', '波特兰', 'Trail Blazers', 'POR', 'Blazers'),
+    ('爵士', '犹他', 'Jazz', 'UTA'),
+    ('勇士', '金州', 'Warriors', 'GSW'),
+    ('快船', '洛杉矶', 'Clippers', 'LAC'),
+    ('湖人', '洛杉矶', 'Lakers', 'LAL'),
+    ('太阳', '菲尼克斯', 'Suns', 'PHX'),
+    ('国王', '萨克拉门托', 'Kings', 'SAC'),
+    ('独行侠', '达拉斯', 'Mavericks', 'DAL', 'Mavs', '小牛'),
+    ('火箭', '休斯顿', 'Rockets', 'HOU'),
+    ('灰熊', '孟菲斯', 'Grizzlies', 'MEM'),
+    ('鹈鹕', '新奥尔良', 'Pelicans', 'NOP'),
+    ('马刺', '圣安东尼奥', 'Spurs', 'SAS'),
+]
+
+# 标题中的标签: 赛事类型、解说语言、录像类型
+TAGS = ['常规赛', '季前赛', '季后赛', '附加赛', '总决赛', '全明星', '杯赛', '全场', '集锦', '国语', '英文', '粤语', '原声']
+
+
+class MatchInfo:
+    """从列表页标题解析出的比赛信息，每个标题只解析一次"""
+
+    __slots__ = ('title', 'month', 'day', 'away', 'home', 'teams', 'tracked', 'tags', 'label')
+
+    def __init__(self, title: str, month: Optional[int], day: Optional[int], away: Optional[str],
+                 home: Optional[str], teams: Tuple[str, ...], tracked: Tuple[str, ...], tags: Tuple[str, ...],
+                 label: str):
+        self.title = title
+        self.month = month
+        self.day = day
+        self.away = away  # 客队（vs 前），未识别时为 None
+        self.home = home  # 主队（vs 后）
+        self.teams = teams  # 标题中出现的所有球队，按出现顺序
+        self.tracked = tracked  # 其中关注的球队，按 TEAMS 中的顺序
+        self.tags = tags
+        self.label = label  # 目录名和文件名中的比赛名: 灰熊vs勇士
+
+    @property
+    def date_text(self) -> Optional[str]:
+        """带前导零的日期: 01月05日"""
+        return f"{self.month:02d}月{self.day:02d}日" if self.month else None
+
+    def __repr__(self):
+        return f"MatchInfo({self.date_text}, {self.away} vs {self.home}, tags={list(self.tags)})"
+
+
+class TitleParser:
+    """用一个预编译的正则一次扫描标题，识别日期、球队（中英文名、城市名、缩写）、vs 和标签
+
+    teams 是关注的球队，不在别名表中的按原样匹配；解析结果按标题缓存。
+    """
+
+    def __init__(self, teams: Iterable[str], cache_size: int = 4096):
+        self._aliases: Dict[str, str] = {}  # 别名 -> 球队中文名，英文名以小写保存
+        case_sensitive, case_insensitive = [], []
+        for name, city, english, abbr, *extra in TEAM_ALIASES:
+            for alias in (name, f"{city}{name}", abbr, *extra):
+                self._aliases[alias] = name
+                case_sensitive.append(alias)
+            self._aliases[english.lower()] = name
+            case_insensitive.append(english)
+
+        # 关注的球队按 TEAMS 中的顺序排列，显示为 TEAMS 中的写法
+        self._tracked_order: Dict[str, int] = {}
+        self._display: Dict[str, str] = {}
+        for team in teams:
+            name = self._lookup(team)
+            if name is None:
+                self._aliases[team] = name = team
+                case_sensitive.append(team)
+            if name not in self._tracked_order:
+                self._tracked_order[name] = len(self._tracked_order)
+                self._display[name] = team
+
+        self._pattern = re.compile(
+            r'(?P<date>(?P<month>\d{1,2})月(?P<day>\d{1,2})日)'
+            rf'|(?P<team>{self._alternatives(case_sensitive)}|(?i:{self._alternatives(case_insensitive)}))'
+            rf'|(?P<tag>{"|".join(map(re.escape, TAGS))})'
+            r'|(?P<vs>vs)'
+        )
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+
+    @staticmethod
+    def _alternatives(aliases) -> str:
+        """长的别名在前；英文和缩写两侧不能是字母，避免匹配到单词内部"""
+        parts = []
+        for alias in sorted(set(aliases), key=len, reverse=True):
+            escaped = re.escape(alias)
+            if alias.isascii():
+                escaped = rf'(?<![A-Za-z]){escaped}(?![A-Za-z])'
+            parts.append(escaped)
+        return '|'.join(parts)
+
+    def _lookup(self, alias: str) -> Optional[str]:
+        return self._aliases.get(alias) or self._aliases.get(alias.lower())
+
+    def _display_name(self, name: Optional[str]) -> Optional[str]:
+        return self._display.get(name, name) if name else None
+
+    def _parse(self, title: str) -> MatchInfo:
+        month = day = None
+        teams, tags = [], []
+        vs = None
+        before_vs = after_vs = None
+        for match in self._pattern.finditer(title):
+            kind = match.lastgroup
+            if kind == 'team':
+                name = self._lookup(match.group('team'))
+                if vs is None:
+                    before_vs = name
+                elif after_vs is None:
+                    after_vs = name
+                if name not in teams:
+                    teams.append(name)
+            elif kind == 'date' and match.start() == 0:
+                # 日期只认标题开头的（列表页标题格式: 01月05日 NBA常规赛 活塞 vs 湖人 全场录像）
+                month, day = int(match.group('month')), int(match.group('day'))
+            elif kind == 'tag' and match.group('tag') not in tags:
+                tags.append(match.group('tag'))
+            elif kind == 'vs' and vs is None:
+                vs = match
+
+        display = self._display_name
+        away, home = (before_vs, after_vs) if vs else (teams + [None, None])[:2]
+        tracked = tuple(display(name) for name in sorted(
+            (name for name in teams if name in self._tracked_order), key=self._tracked_order.get
+        ))
+        if len(tracked) >= 2:
+            label = f"{tracked[0]}vs{tracked[1]}"
+        elif vs:
+            # 标题中 vs 前后的词: 活塞 vs 湖人 -> 活塞vs湖人
+            before = title[:vs.start()].strip().split(' ')[-1]
+            after = title[vs.end():].strip().split(' ')[0]
+            label = f"{before}vs{after}"
+        else:
+            label = title
+        return MatchInfo(title, month, day, display(away), display(home),
+                         tuple(display(name) for name in teams), tracked, tuple(tags), label)
+
+    def is_tracked(self, title: str) -> bool:
+        """标题中是否有关注的球队"""
+        return bool(self.parse(title).tracked)
@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+MB = 1024 * 1024
+
+
+class StageStats:
+    """单个阶段的累计统计"""
+
+    __slots__ = ('count', 'errors', 'total_seconds', 'max_seconds', 'bytes')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total_seconds': round(self.total_seconds, 3),
+            'avg_seconds': round(self.total_seconds / self.count, 3) if self.count else 0,
+            'max_seconds': round(self.max_seconds, 3),
+            'bytes': self.bytes,
+            'mb_per_second': round(self.bytes / MB / self.total_seconds, 2) if self.total_seconds and self.bytes else 0,
+        }
+
+
+class RunMetrics:
+    """记录一次运行中各阶段（页面抓取、解析、链接解析、下载）的耗时、字节数和吞吐
+
+    线程安全，结束时写出 JSON 运行报告和 Prometheus textfile。
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageStats] = {}
+        self.downloads: List[Dict[str, Any]] = []  # 每个下载的明细
+
+    @contextmanager
+    def stage(self, name: str):
+        """统计代码块耗时，可在返回的字典中设置 'bytes'；块内抛出异常时记为一次错误"""
+        record = {'bytes': 0}
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException:
+            self.record(name, time.perf_counter() - start, record['bytes'], error=True)
+            raise
+        self.record(name, time.perf_counter() - start, record['bytes'], error=record.get('error', False))
+
+    def record(self, name: str, seconds: float, size: int = 0, error: bool = False):
+        """记录一次阶段执行"""
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = StageStats()
+            stats.count += 1
+            stats.errors += 1 if error else 0
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.bytes += size
+
+    def record_download(self, filename: str, seconds: float, size: int, success: bool):
+        """记录一个视频的下载结果"""
+        self.record('download', seconds, size, error=not success)
+        with self._lock:
+            self.downloads.append({
+                'file': filename,
+                'seconds': round(seconds, 3),
+                'bytes': size,
+                'mb_per_second': round(size / MB / seconds, 2) if seconds and size else 0,
+                'success': success,
+            })
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def stages(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self._stages.items()}
+
+    def report(self, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """生成运行报告"""
+        with self._lock:
+            downloads = list(self.downloads)
+        report = {
+            'started_at': self.started_at,
+            'duration_seconds': round(self.elapsed, 3),
+            'stages': self.stages(),
+            'downloads': downloads,
+        }
+        report.update(extra or {})
+        return report
+
+    def summary_lines(self) -> List[str]:
+        """简短的吞吐统计，用于飞书消息"""
+        stages = self.stages()
+        lines = [f"总耗时：{self.elapsed / 60:.1f} 分钟"]
+        download = stages.get('download')
+        if download and download['count']:
+            lines.append(
+                f"下载：{download['count'] - download['errors']}/{download['count']} 个文件，"
+                f"{download['bytes'] / 1024 / MB:.2f}GB，平均 {download['mb_per_second']:.1f}MB/s"
+            )
+        page = stages.get('page_fetch')
+        if page and page['count']:
+            lines.append(f"页面抓取：{page['count']} 次，平均 {page['avg_seconds']:.2f}s")
+        parse_seconds = sum(stats['total_seconds'] for name, stats in stages.items() if name.startswith('parse_'))
+        if parse_seconds:
+            lines.append(f"页面解析：共 {parse_seconds:.2f}s")
+        return lines
+
+    def write_json(self, path: str, extra: Optional[Dict[str, Any]] = None):
+        """写出 JSON 运行报告"""
+        _atomic_write(path, json.dumps(self.report(extra), ensure_ascii=False, indent=2))
+
+    def write_prometheus(self, path: str, labels: Optional[Dict[str, int]] = None):
+        """写出 Prometheus textfile（供 node_exporter 的 textfile collector 读取）"""
+        lines = [
+            '# HELP nba_downloader_last_run_timestamp_seconds Start time of the last run.',
+            '# TYPE nba_downloader_last_run_timestamp_seconds gauge',
+            f'nba_downloader_last_run_timestamp_seconds {self.started_at:.0f}',
+            '# HELP nba_downloader_last_run_duration_seconds Wall time of the last run.',
+            '# TYPE nba_downloader_last_run_duration_seconds gauge',
+            f'nba_downloader_last_run_duration_seconds {self.elapsed:.3f}',
+        ]
+        metrics = [
+            ('count', 'Number of executions of the stage.'),
+            ('errors', 'Number of failed executions of the stage.'),
+            ('total_seconds', 'Total time spent in the stage.'),
+            ('max_seconds', 'Longest single execution of the stage.'),
+            ('bytes', 'Bytes transferred by the stage.'),
+            ('mb_per_second', 'Effective throughput of the stage in MB/s.'),
+        ]
+        stages = self.stages()
+        for key, help_text in metrics:
+            name = f'nba_downloader_stage_{key}'
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            for stage, stats in sorted(stages.items()):
+                lines.append(f'{name}{{stage="{stage}"}} {stats[key]}')
+        if labels:
+            lines.append('# HELP nba_downloader_matches Matches of the last run by status.')
+            lines.append('# TYPE nba_downloader_matches gauge')
+            for status, value in sorted(labels.items()):
+                lines.append(f'nba_downloader_matches{{status="{status}"}} {value}')
+        _atomic_write(path, '\n'.join(lines) + '\n')
+
+
+def _atomic_write(path: str, content: str):
+    """先写临时文件再重命名，读取方不会看到写了一半的文件"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
@@ -1,111 +1,188 @@
 import os
+import argparse
 import requests
+from requests.adapters import HTTPAdapter
 import logging
-from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
+from datetime import date, datetime, timedelta
 from urllib.parse import urljoin
-import time
-import random
 import re
-from tqdm import tqdm
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
+import hashlib
 
-try:
-    from selenium import webdriver
-    from selenium.webdriver.chrome.service import Service
-    from selenium.webdriver.chrome.options import Options
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
-    from webdriver_manager.chrome import ChromeDriverManager
-    SELENIUM_AVAILABLE = True
-except (ImportError, Exception) as e:
-    SELENIUM_AVAILABLE = False
-    print(f"Selenium not available, falling back to requests mode: {str(e)}")
-
-from nba_downloader.config import TEAMS, BASE_URL, DOWNLOAD_DIR, PREFERRED_QUALITY, DEBUG, YOU_GET_QUALITY_ARGS
+from nba_downloader.config import (
+    TEAMS, PROFILES, BASE_URL, DOWNLOAD_DIR, PREFERRED_QUALITY, DEBUG, YOU_GET_QUALITY_ARGS, QUALITY_FALLBACK, FORMAT_CACHE_TTL,
+    DAYS_TO_LOOK_BACK, MAX_LISTING_PAGES, BACKFILL_MAX_PAGES, INCREMENTAL_LISTING, LISTING_RETENTION_DAYS,
+    MAX_ACTIVE_DOWNLOADS, MAX_CONNECTIONS_PER_HOST, BANDWIDTH_LIMIT, BANDWIDTH_PROFILES,
+    RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_THROTTLED_DELAY, RETRY_MAX_DELAY,
+    CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_RESET,
+    MAX_RESOLVE_WORKERS, REQUEST_TIMEOUT, BROWSER_MODE, LEDGER_PATH,
+    DOWNLOAD_BACKENDS, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_SEGMENTS, MIN_SEGMENT_SIZE,
+    HTTP_CACHE_DIR, HTTP_CACHE_TTL, HTTP_CACHE_MAX_BYTES, HTML_PARSER, HTML_PARSER_STREAMING,
+    METRICS_REPORT_PATH, METRICS_PROMETHEUS_PATH, DAEMON_POLL_INTERVAL, DAEMON_POLL_PROFILES,
+    RETENTION_MAX_BYTES, RETENTION_MIN_FREE_BYTES, RETENTION_MAX_DIRS,
+    REMUX_ENABLED, REMUX_FULL_GAME, MAX_REMUX_WORKERS, FFMPEG_PATH,
+    FEISHU_WEBHOOK_URL, NOTIFY_SPOOL_DIR, NOTIFY_TIMEOUT, NOTIFY_MATCH_EVENTS, NOTIFY_COALESCE_DELAY,
+    NOTIFY_FLUSH_TIMEOUT, NOTIFY_MAX_AGE, LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT
+)
+from nba_downloader.bandwidth import DownloadScheduler
+from nba_downloader.browser import HeadlessBrowser
+from nba_downloader.daemon import Daemon
+from nba_downloader.http_cache import HttpCache
+from nba_downloader.ledger import DownloadLedger
+from nba_downloader.logs import setup_logging
+from nba_downloader.match_info import TitleParser
+from nba_downloader.metrics import RunMetrics
+from nba_downloader.notify import FeishuOutbox
+from nba_downloader.parsers import get_parser
+from nba_downloader.pipeline import bounded_map
+from nba_downloader.postprocess import Remuxer
+from nba_downloader.profiles import Profile, all_teams, load_profiles, share_file
+from nba_downloader.retention import RetentionManager
+from nba_downloader.retry import CircuitBreaker, RetryPolicy
 from nba_downloader.video_downloader import VideoDownloader
 
-# 飞书 webhook URL
-FEISHU_WEBHOOK_URL = "https://open.feishu.cn/open-apis/bot/v2/hook/453de894-fdba-4a72-aa01-21b8b756d2e1"
-
-# 设置日志
-logging.basicConfig(
-    level=logging.DEBUG if DEBUG else logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(DOWNLOAD_DIR, 'nba_downloader.log')),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+QUARTERS = ['第一节', '第二节', '第三节', '第四节']
+
 class NBAVideoDownloader:
-    def __init__(self):
+    def __init__(self, teams=None, profiles=None):
+        # 订阅：各自的球队、清晰度和下载目录，默认为 PROFILES 中的全部订阅
+        self.profiles = list(profiles or load_profiles(PROFILES, TEAMS, PREFERRED_QUALITY, DOWNLOAD_DIR))
+        if teams:
+            # 命令行指定的球队替换各订阅的球队，如补下载新关注的球队
+            self.profiles = [Profile(profile.name, teams, profile.quality, profile.download_dir)
+                             for profile in self.profiles]
+        self.teams = all_teams(self.profiles)  # 列表页只抓取一次，按所有订阅的球队筛选
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
-        self.use_selenium = True
-        self.driver = None
-        self.video_downloader = VideoDownloader(DOWNLOAD_DIR, YOU_GET_QUALITY_ARGS)
+        # 连接池大小覆盖解析线程数和并发下载数，保证并发请求都能复用 keep-alive 连接
+        pool_size = max(MAX_RESOLVE_WORKERS, MAX_ACTIVE_DOWNLOADS * DOWNLOAD_SEGMENTS, 1)
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.ledger = DownloadLedger(LEDGER_PATH)  # 跨运行的下载记录
+        # 所有比赛的下载按优先级排队，共享总带宽上限
+        self.scheduler = DownloadScheduler(MAX_ACTIVE_DOWNLOADS, BANDWIDTH_LIMIT, BANDWIDTH_PROFILES)
+        # 所有视频通常来自同一个 CDN 主机，每个进行中的下载至少需要一个连接，
+        # 连接数上限小于同时下载数时多出的下载线程只能空等
+        max_connections_per_host = MAX_CONNECTIONS_PER_HOST
+        if max_connections_per_host < MAX_ACTIVE_DOWNLOADS:
+            logger.warning(f"MAX_CONNECTIONS_PER_HOST ({MAX_CONNECTIONS_PER_HOST}) 小于 MAX_ACTIVE_DOWNLOADS "
+                           f"({MAX_ACTIVE_DOWNLOADS})，按 {MAX_ACTIVE_DOWNLOADS} 处理")
+            max_connections_per_host = MAX_ACTIVE_DOWNLOADS
+        self.video_downloader = VideoDownloader(
+            DOWNLOAD_DIR, YOU_GET_QUALITY_ARGS, max_connections_per_host=max_connections_per_host,
+            session=self.session, backends=DOWNLOAD_BACKENDS, chunk_size=DOWNLOAD_CHUNK_SIZE,
+            segments=DOWNLOAD_SEGMENTS, min_segment_size=MIN_SEGMENT_SIZE, throttle=self.scheduler.throttle,
+            quality_fallback=QUALITY_FALLBACK, format_cache=self.ledger, format_cache_ttl=FORMAT_CACHE_TTL,
+            retry_policy=RetryPolicy(RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_THROTTLED_DELAY),
+            circuit_breaker=CircuitBreaker(CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_RESET)
+        )
         self.download_results = {
             'matches': [],  # 所有符合条件的比赛
             'success': [],  # 成功下载的比赛
             'failed': [],   # 下载失败的比赛
             'errors': {}    # 失败原因
         }
-        self.init_selenium()
+        self._results_lock = threading.Lock()  # 保护 download_results，供多线程写入
+        self.parser = get_parser(HTML_PARSER, streaming=HTML_PARSER_STREAMING)
+        self.titles = TitleParser(self.teams)  # 标题只解析一次，结果按标题缓存
+        self.page_cache = HttpCache(HTTP_CACHE_DIR, HTTP_CACHE_TTL, HTTP_CACHE_MAX_BYTES) if HTTP_CACHE_DIR else None
+        self.metrics = RunMetrics()  # 各阶段耗时和吞吐
+        # 下载前按磁盘预算清理各下载目录中最早的比赛目录，三个限制都为 0 时不清理
+        self.retention = {
+            download_dir: RetentionManager(
+                download_dir, RETENTION_MAX_BYTES, RETENTION_MIN_FREE_BYTES, RETENTION_MAX_DIRS
+            ) for download_dir in dict.fromkeys(profile.download_dir for profile in self.profiles)
+        } if RETENTION_MAX_BYTES or RETENTION_MIN_FREE_BYTES or RETENTION_MAX_DIRS else {}
+        # 下载完成的比赛在独立线程池中重新封装，不占用下载线程
+        self.remuxer = Remuxer(FFMPEG_PATH, MAX_REMUX_WORKERS, concat=REMUX_FULL_GAME) if REMUX_ENABLED else None
+        if self.remuxer and not self.remuxer.available:
+            logger.warning(f"未找到 ffmpeg ({FFMPEG_PATH})，跳过下载后处理")
+            self.remuxer.shutdown()
+            self.remuxer = None
+        self.remux_futures = []
+        # 飞书消息由后台线程发送，webhook 慢或不可用时不阻塞下载
+        self.outbox = FeishuOutbox(
+            FEISHU_WEBHOOK_URL, NOTIFY_SPOOL_DIR, NOTIFY_TIMEOUT, coalesce_delay=NOTIFY_COALESCE_DELAY,
+            max_age=NOTIFY_MAX_AGE
+        ) if FEISHU_WEBHOOK_URL else None
+        self.downloaded = set()  # 新下载、还没有计入比赛通知的文件
+        self.notified = {}  # 每场比赛最近一次发送的通知，常驻模式下结果不变时不重复发送
+        # 浏览器在第一次需要时才启动
+        self.browser = HeadlessBrowser(self.session.headers['User-Agent'], headless=not DEBUG)
 
-    def init_selenium(self):
-        """初始化Selenium"""
-        try:
-            chrome_options = Options()
-            if not DEBUG:
-                chrome_options.add_argument('--headless')
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--window-size=1920,1080')
-            chrome_options.add_argument(f'user-agent={self.session.headers["User-Agent"]}')
-
-            # 禁用webdriver特征
-            chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            chrome_options.add_experimental_option('useAutomationExtension', False)
-
-            self.driver = webdriver.Chrome(options=chrome_options)
-            self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
-                'source': '''
-                    Object.defineProperty(navigator, 'webdriver', {
-                        get: () => undefined
-                    })
-                '''
-            })
-            logger.info("Selenium initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize Selenium: {str(e)}")
-            self.use_selenium = False
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def cancel(self):
+        """取消下载（如收到 SIGTERM）：进行中的下载保存进度后停止，排队的下载不再开始"""
+        self.video_downloader.cancel()
 
-    def __del__(self):
+    @property
+    def cancelled(self):
+        return self.video_downloader.cancelled
+
+    def close(self):
         """清理资源"""
-        if self.driver:
-            try:
-                self.driver.quit()
-            except:
-                pass
-
-    def get_yesterday_dates(self):
-        """获取前一天的日期，返回多种格式以便匹配"""
-        yesterday = datetime.now() - timedelta(days=1)
-        # 返回多种可能的日期格式
-        dates = {
-            'standard': yesterday.strftime('%m月%d日'),  # 01月05日，用于匹配
-            'display': yesterday.strftime('%-m月%-d号'),  # 1月5号，用于显示
-            'numeric': yesterday.strftime('%m%d')  # 0105
-        }
-        logger.debug(f"Generated yesterday dates: {dates}")
+        self.scheduler.shutdown()
+        if self.remuxer:
+            self.remuxer.shutdown(cancel_pending=self.cancelled)
+        if self.outbox:
+            self.outbox.close(NOTIFY_FLUSH_TIMEOUT)
+        self.browser.close()
+        self.ledger.close()
+
+    def get_target_dates(self, days=None, today=None):
+        """获取回看窗口内的所有日期，返回 {'01月05日': date} 形式的字典以便匹配"""
+        days = DAYS_TO_LOOK_BACK if days is None else days
+        today = today or date.today()
+        dates = {}
+        for offset in range(1, max(days, 1) + 1):
+            day = today - timedelta(days=offset)
+            dates[day.strftime('%m月%d日')] = day
+        logger.debug(f"Generated target dates: {list(dates)}")
+        return dates
+
+    def get_date_range(self, start, end):
+        """获取 [start, end] 内的所有日期，格式同 get_target_dates"""
+        dates = {}
+        day = end
+        while day >= start:
+            dates[day.strftime('%m月%d日')] = day
+            day -= timedelta(days=1)
         return dates
 
+    def resolve_listing_date(self, date_text, today=None):
+        """将不带年份的 '01月05日' 解析为不晚于今天的最近日期"""
+        match = re.match(r'(\d{1,2})月(\d{1,2})日', date_text or '')
+        if not match:
+            return None
+        return self.resolve_month_day(int(match.group(1)), int(match.group(2)), today)
+
+    def resolve_month_day(self, month, day, today=None):
+        """将不带年份的月日解析为不晚于今天的最近日期"""
+        if not month:
+            return None
+        today = today or date.today()
+        try:
+            resolved = date(today.year, month, day)
+            if resolved > today:  # 跨年：12月的比赛在1月看到
+                resolved = date(today.year - 1, month, day)
+            return resolved
+        except ValueError:
+            return None
+
     def format_date(self, date_text):
         """格式化日期文本，去掉前导零"""
         # 使用正则表达式匹配日期格式
@@ -117,123 +194,157 @@ class NBAVideoDownloader:
         return date_text
 
     def extract_date_from_title(self, title):
-        """从标题中提取日期"""
-        try:
-            # 匹配格式：01月05日 或 1月5日
-            date_match = re.search(r'(\d{1,2})月(\d{1,2})日', title)
-            if date_match:
-                month, day = date_match.groups()
-                # 保持带前导零的格式用于匹配
-                return f"{int(month):02d}月{int(day):02d}日"
-            return None
-        except Exception as e:
-            logger.error(f"Error extracting date from title: {str(e)}")
-            return None
+        """从标题中提取日期（带前导零的格式用于匹配）"""
+        return self.titles.parse(title).date_text
+
+    def create_match_directory(self, date_text, title, profile=None):
+        """比赛目录（在订阅的下载目录中，默认为第一个订阅）"""
+        profile = profile or self.profiles[0]
+        # 比赛名: 两支关注的球队按 TEAMS 顺序，否则为标题中 vs 前后的球队
+        teams_str = profile.titles.parse(title).label
 
-    def create_match_directory(self, date_text, title):
-        """创建比赛目录"""
-        # 从标题中提取球队信息
-        teams = []
-        for team in TEAMS:
-            if team in title:
-                teams.append(team)
-        
-        if len(teams) >= 2:
-            teams_str = f"{teams[0]}vs{teams[1]}"
-        else:
-            teams_str = title
-            
         # 创建简洁的目录名: 1月5号灰熊vs勇士
         formatted_date = self.format_date(date_text)  # 格式化日期，去掉前导零
         dir_name = f"{formatted_date}{teams_str}"
         dir_name = re.sub(r'[<>:"/\\|?*]', '', dir_name)  # 移除非法字符
-        return os.path.join(DOWNLOAD_DIR, dir_name)
+        return os.path.join(profile.download_dir, dir_name)
 
-    def is_yesterday_match(self, date_text):
-        """检查是否是昨天的比赛"""
+    def is_target_match(self, date_text, target_dates):
+        """检查比赛日期是否在回看窗口内"""
         if not date_text:
             return False
-            
-        yesterday_dates = self.get_yesterday_dates()
-        logger.debug(f"Comparing date_text '{date_text}' with yesterday_dates {yesterday_dates}")
-        
+
         # 标准化日期格式进行比较
-        try:
-            match = re.match(r'(\d{1,2})月(\d{1,2})日', date_text)
-            if match:
-                month, day = match.groups()
-                normalized_date = f"{int(month):02d}月{int(day):02d}日"
-                return normalized_date == yesterday_dates['standard']
-        except Exception as e:
-            logger.error(f"Error comparing dates: {str(e)}")
-            return False
-            
-        return False
+        return self.titles.parse(date_text).date_text in target_dates
 
     def is_team_match(self, match_title):
         """检查比赛是否包含关注的球队"""
-        return any(team in match_title for team in TEAMS)
+        return self.titles.is_tracked(match_title)
 
     def get_page_content(self, url, use_selenium=False):
         """获取页面内容"""
         logger.info(f"Fetching URL: {url}")
-        try:
-            if use_selenium and self.use_selenium:
-                self.driver.get(url)
-                time.sleep(random.uniform(2, 3))  # 等待页面加载
-                content = self.driver.page_source
-                logger.debug("Page fetched using Selenium")
-            else:
-                response = self.session.get(url)
-                response.raise_for_status()
-                content = response.text
-                logger.debug("Page fetched using requests")
+        with self.metrics.stage('page_fetch') as stage:
+            try:
+                content = None
+                if use_selenium and BROWSER_MODE != 'never':
+                    content = self.browser.get_page_source(url)
+                    if content is not None:
+                        logger.debug("Page fetched using Selenium")
+                if content is None:
+                    content = self.fetch_page(url)
 
-            if DEBUG:
-                logger.debug(f"Content length: {len(content)}")
-            return content
-        except Exception as e:
-            logger.error(f"Error fetching page {url}: {str(e)}")
-            return None
+                stage['bytes'] = len(content.encode('utf-8'))
+                if DEBUG:
+                    logger.debug(f"Content length: {len(content)}")
+                return content
+            except Exception as e:
+                logger.error(f"Error fetching page {url}: {str(e)}")
+                stage['error'] = True
+                return None
+
+    def fetch_page(self, url):
+        """用 requests 获取页面，经过页面缓存：TTL 内直接返回，过期后发送条件请求"""
+        cached = self.page_cache.get(url) if self.page_cache else None
+        if cached and cached['fresh']:
+            logger.debug("Page served from cache")
+            return cached['body']
+
+        headers = {}
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304 and cached:
+            self.page_cache.refresh(url)
+            logger.debug("Page not modified, using cache")
+            return cached['body']
+
+        response.raise_for_status()
+        content = response.text
+        logger.debug("Page fetched using requests")
+        if self.page_cache:
+            self.page_cache.put(url, content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return content
 
     def get_video_url(self, detail_url):
-        """从详情页获取视频URL"""
+        """从详情页获取视频URL，计入 resolve 阶段的耗时"""
+        with self.metrics.stage('resolve') as stage:
+            video_links = self._get_video_url(detail_url)
+            stage['error'] = video_links is None
+            return video_links
+
+    def _get_video_url(self, detail_url):
         try:
+            # 已解析出全部四节的详情页不再请求
+            resolved_links = self.ledger.get_resolved_links(detail_url)
+            if resolved_links:
+                logger.info(f"Using resolved video links for {detail_url}")
+                return resolved_links
+
             content = self.get_page_content(detail_url)
             if not content:
                 return None
                 
-            soup = BeautifulSoup(content, 'html.parser')
             video_links = []
             
             # 查找微博链接
-            for a in soup.select('#lx li.cd a, #jj li.cd a'):
-                if '微博' in a.text:
+            with self.metrics.stage('parse_detail'):
+                weibo_links = self.parser.weibo_links(content)
+            for text, weibo_url in weibo_links:
+                if '微博' in text:
                     quarter = None
-                    for q in ['第一节', '第二节', '第三节', '第四节']:
-                        if q in a.text:
+                    for q in QUARTERS:
+                        if q in text:
                             quarter = q
                             break
                     
-                    weibo_url = a['href']
                     logger.info(f"Found Weibo video: {weibo_url}")
                     
                     video_links.append({
                         'type': 'weibo',
                         'url': weibo_url,
-                        'text': a.text,
+                        'text': text,
                         'quarter': quarter,
-                        'priority': 2 if '国语' in a.text else 1
+                        'priority': 2 if '国语' in text else 1
                     })
             
-            # 按优先级排序视频链接（微博国语 > 微博普通）
-            video_links.sort(key=lambda x: (-x['priority'], x['quarter'] or ''))
+            # 按优先级排序视频链接（微博国语 > 微博普通），同一优先级按节的顺序
+            video_links.sort(key=lambda x: (-x['priority'], QUARTERS.index(x['quarter']) if x['quarter'] else len(QUARTERS)))
+
+            # 四节都已发布时记住解析结果，之后不再请求该详情页
+            quarters = {link['quarter'] for link in video_links}
+            if quarters.issuperset(QUARTERS):
+                self.ledger.save_resolved_links(detail_url, video_links)
             return video_links
             
         except Exception as e:
             logger.error(f"Error getting video URL from detail page: {str(e)}")
             return None
 
+    @staticmethod
+    def match_name(match):
+        """下载结果中比赛的名称: 01月05日 湖人vs勇士，同一对球队不同日期的比赛分开统计"""
+        return f"{match['date']} {match['title']}"
+
+    def record_success(self, match):
+        """记录下载成功的比赛（线程安全）"""
+        name = self.match_name(match)
+        with self._results_lock:
+            if name not in self.download_results['success']:
+                self.download_results['success'].append(name)
+
+    def record_failure(self, match, error_msg):
+        """记录下载失败的比赛，只保留第一条失败原因（线程安全）"""
+        name = self.match_name(match)
+        with self._results_lock:
+            if name not in self.download_results['failed']:
+                self.download_results['failed'].append(name)
+                self.download_results['errors'][name] = error_msg
+
     def convert_quarter_name(self, quarter_text):
         """将中文节数转换为数字"""
         quarter_map = {
@@ -245,71 +356,262 @@ class NBAVideoDownloader:
         }
         return quarter_map.get(quarter_text, quarter_text)
 
-    def process_match(self, match):
-        """处理单场比赛"""
+    def resolve_match(self, match):
+        """解析比赛详情页，返回附带 video_links 的比赛信息"""
+        resolved = dict(match)
+        resolved['video_links'] = self.get_video_url(match['url'])
+        return resolved
+
+    def download_video(self, match, video_info, match_dir, filename, quality=None):
+        """下载单个视频，下载记录中已完成且文件仍存在的直接跳过"""
+        target = os.path.join(match_dir, filename)
+        url = video_info['url']
+        if self.ledger.is_done(url, target):
+            if self.video_downloader.find_output_file(match_dir, filename):
+                logger.info(f"已下载，跳过: {filename}")
+                return True
+            logger.info(f"下载记录存在但文件缺失，重新下载: {filename}")
+
+        self.ledger.mark_started(url, target)
+        start = time.perf_counter()
+        if self.video_downloader.download(video_info, match_dir, filename, quality or PREFERRED_QUALITY):
+            output_file = self.video_downloader.find_output_file(match_dir, filename)
+            size = os.path.getsize(output_file) if output_file else 0
+            self.metrics.record_download(filename, time.perf_counter() - start, size, True)
+            self.ledger.mark_done(url, target, size)
+            with self._results_lock:
+                self.downloaded.add(target)
+            return True
+
+        if self.cancelled:
+            return False  # 保持 started 状态，下次运行继续下载
+        self.metrics.record_download(filename, time.perf_counter() - start, 0, False)
+
+        error_msg = f"下载失败: {video_info.get('text', '')}"
+        logger.error(error_msg)
+        self.ledger.mark_failed(url, target, error_msg)
+        self.record_failure(match, error_msg)
+        return False
+
+    def enforce_retention(self, matches):
+        """下载开始前清理旧目录，为本轮的比赛预留空间，避免下载到一半磁盘写满"""
+        for download_dir, retention in self.retention.items():
+            upcoming = [
+                os.path.basename(self.create_match_directory(match['date'], match['title'], profile))
+                for match in matches for profile in self.match_profiles(match) if profile.download_dir == download_dir
+            ]
+            try:
+                removed = retention.enforce(upcoming)
+                if removed:
+                    logger.info(f"清理了 {len(removed)} 个旧比赛目录: {download_dir}")
+            except OSError as e:
+                logger.error(f"清理旧目录失败: {str(e)}")
+
+    def match_profiles(self, match):
+        """订阅了这场比赛的订阅"""
+        return [profile for profile in self.profiles if profile.wants(match['title'])]
+
+    def match_priority(self, match):
+        """比赛的下载优先级，越小越先下载：TEAMS 中排在前面的球队优先，同一球队较新的比赛优先，
+        其余按详情页排序，保证一场比赛下完再下一场"""
+        tracked = self.titles.parse(match['title']).tracked
+        team_rank = self.teams.index(tracked[0]) if tracked else len(self.teams)
+        match_date = self.resolve_listing_date(match['date'])
+        return team_rank, -match_date.toordinal() if match_date else 0, match['url']
+
+    def schedule_match(self, match):
+        """把单场比赛的视频加入全局下载队列，失败时返回 None
+
+        详情页只解析一次，所有订阅了这场比赛的订阅共用；清晰度相同的订阅只下载一次，
+        下载完成后链接到其他订阅的目录。返回下载任务列表，每种清晰度一个
+        （比赛目录、文件名、future 和需要同步的其他订阅目录）
+        """
         logger.info(f"Processing match: {match['title']}")
         
         try:
-            # 创建比赛目录
-            match_dir = self.create_match_directory(match['date'], match['title'])
-            
-            # 获取视频链接
-            video_links = self.get_video_url(match['url'])
+            # 获取视频链接（解析阶段已获取的直接使用）
+            if 'video_links' in match:
+                video_links = match['video_links']
+            else:
+                video_links = self.get_video_url(match['url'])
             if not video_links:
                 error_msg = "未找到视频链接"
                 logger.error(error_msg)
-                self.download_results['failed'].append(match['title'])
-                self.download_results['errors'][match['title']] = error_msg
-                return False
-
-            # 提取球队信息用于文件名
-            teams = []
-            for team in TEAMS:
-                if team in match['title']:
-                    teams.append(team)
-            
-            base_filename = f"{teams[0]}vs{teams[1]}" if len(teams) >= 2 else match['title']
-            
-            # 下载视频
-            success = True
+                self.record_failure(match, error_msg)
+                return None
+
+            # 生成每个视频的文件名后缀；同一文件名只下载优先级最高的链接（已按优先级排序），
+            # 避免并发下载写同一个文件
+            tasks = []
+            suffixes = set()
             for video_info in video_links:
                 if '节' in video_info.get('text', ''):
                     # 将中文节数转换为数字: 灰熊vs勇士_第1节
                     quarter = re.search(r'第[一二三四]节|加时', video_info['text'])
                     if quarter:
                         quarter_num = self.convert_quarter_name(quarter.group())
-                        filename = f"{base_filename}_第{quarter_num}节"
+                        suffix = f"_第{quarter_num}节"
                     else:
-                        filename = f"{base_filename}_{video_info['text']}"
+                        suffix = f"_{video_info['text']}"
                 else:
-                    filename = base_filename
+                    suffix = ''
+                if suffix in suffixes:
+                    logger.debug(f"Skipping lower priority video for {suffix or match['title']}: {video_info['url']}")
+                    continue
+                suffixes.add(suffix)
+                tasks.append((video_info, suffix))
 
-                if not self.video_downloader.download(video_info, match_dir, filename, PREFERRED_QUALITY):
-                    error_msg = f"下载失败: {video_info.get('text', '')}"
-                    logger.error(error_msg)
-                    success = False
-                    if match['title'] not in self.download_results['failed']:
-                        self.download_results['failed'].append(match['title'])
-                        self.download_results['errors'][match['title']] = error_msg
+            # 按清晰度分组，每组下载到第一个订阅的目录（文件名使用与目录相同的比赛名）
+            groups = {}
+            for profile in self.match_profiles(match):
+                groups.setdefault(profile.quality, []).append((
+                    self.create_match_directory(match['date'], match['title'], profile),
+                    profile.titles.parse(match['title']).label,
+                ))
 
-            if success:
-                self.download_results['success'].append(match['title'])
-            return success
+            # 按比赛优先级加入全局队列，同一场比赛内保持视频链接的顺序
+            priority = self.match_priority(match)
+            jobs = []
+            for group, (quality, targets) in enumerate(groups.items()):
+                (match_dir, base_filename), mirrors = targets[0], targets[1:]
+                jobs.append({
+                    'match_dir': match_dir,
+                    'base_filename': base_filename,
+                    'quality': quality,
+                    'mirrors': mirrors,
+                    'downloads': [
+                        (f"{base_filename}{suffix}", self.scheduler.submit(
+                            priority + (group, index), self.download_video,
+                            match, video_info, match_dir, f"{base_filename}{suffix}", quality))
+                        for index, (video_info, suffix) in enumerate(tasks)
+                    ],
+                })
+            return jobs
 
         except Exception as e:
             error_msg = str(e)
             logger.error(f"处理比赛时发生错误: {error_msg}")
-            self.download_results['failed'].append(match['title'])
-            self.download_results['errors'][match['title']] = error_msg
+            self.record_failure(match, error_msg)
+            return None
+
+    def finish_match(self, match, jobs):
+        """等待单场比赛的所有下载完成，记录结果，下载完成的比赛同步到其他订阅并交给后处理"""
+        if not jobs:
+            self.notify_match(match, False)
             return False
+        success = all([self.finish_job(match, job) for job in jobs])
+        targets = {os.path.join(job['match_dir'], filename) for job in jobs for filename, _ in job['downloads']}
+        with self._results_lock:
+            changed = bool(self.downloaded & targets)
+            self.downloaded -= targets
+        self.notify_match(match, success, changed)
+        if success:
+            self.record_success(match)
+            # 四节都已发布并下载完成的比赛，之后的轮询不再处理
+            if INCREMENTAL_LISTING and self.ledger.get_resolved_links(match['url']):
+                self.ledger.mark_listing_done(match['url'])
+        return success
+
+    def finish_job(self, match, job):
+        """等待一种清晰度的下载完成"""
+        try:
+            success = all([future.result() for _, future in job['downloads']])
+        except Exception as e:
+            error_msg = str(e)
+            logger.error(f"处理比赛时发生错误: {error_msg}")
+            self.record_failure(match, error_msg)
+            return False
+        if success:
+            self.mirror_files(job, self.job_files(job))
+            self.remux_match(job)
+        return success
+
+    def job_files(self, job):
+        """下载任务已完成的文件"""
+        paths = [self.video_downloader.find_output_file(job['match_dir'], filename) for filename, _ in job['downloads']]
+        return [path for path in paths if path]
+
+    def mirror_files(self, job, paths, removed=()):
+        """把下载的文件链接到清晰度相同的其他订阅的目录，removed 为已不存在的文件（如后处理改了扩展名）"""
+        prefix = len(job['base_filename'])
+        for match_dir, base_filename in job['mirrors']:
+            try:
+                os.makedirs(match_dir, exist_ok=True)
+                for path in paths:
+                    share_file(path, os.path.join(match_dir, f"{base_filename}{os.path.basename(path)[prefix:]}"))
+                for path in removed:
+                    stale = os.path.join(match_dir, f"{base_filename}{os.path.basename(path)[prefix:]}")
+                    if os.path.exists(stale):
+                        os.remove(stale)
+            except OSError as e:
+                logger.error(f"同步到 {match_dir} 失败: {str(e)}")
+
+    def notify_match(self, match, success, changed=False):
+        """单场比赛有新下载的文件或新的失败时发送通知（合并后发送，不等待）
+
+        常驻模式下每次轮询都会重新处理未下载完的比赛，结果没有变化时不重复通知
+        """
+        if not self.outbox or not NOTIFY_MATCH_EVENTS or self.cancelled:
+            return
+        title = match['title']
+        # 其他下载线程在锁内写入失败原因，在锁内读取并记录本次通知
+        with self._results_lock:
+            if success:
+                message = f"✅ 下载完成：{title}"
+            else:
+                reason = self.download_results['errors'].get(self.match_name(match), '未知原因')
+                message = f"❌ 下载失败：{title}\n  原因：{reason}"
+            last = self.notified.get(match['url'])
+            # 成功：有新下载的文件，或上次通知的是失败；失败：失败原因与上次通知的不同
+            if success and not changed and (last is None or last == message):
+                return
+            if not success and last == message:
+                return
+            self.notified[match['url']] = message
+        # 同一场比赛只发送最新的结果（如常驻模式下失败后又下载成功）
+        self.outbox.send(message, key=f"match:{match['url']}")
+
+    def remux_match(self, job):
+        """把比赛的录像提交到后处理线程池，不等待完成"""
+        if not self.remuxer or self.cancelled:
+            return
+        paths = self.job_files(job)
+        if paths:
+            self.remux_futures.append(self.remuxer.submit(self.remux_files, job, paths))
+
+    def remux_files(self, job, paths):
+        """重新封装比赛的录像（在后处理线程中运行），结果同步到其他订阅，不重复处理"""
+        with self.metrics.stage('remux') as record:
+            outputs = self.remuxer.process(job['match_dir'], paths, job['base_filename'])
+            record['bytes'] = sum(os.path.getsize(path) for path in outputs if os.path.exists(path))
+        self.mirror_files(job, outputs, removed=[path for path in paths if not os.path.exists(path)])
+        return outputs
+
+    def wait_remux(self):
+        """等待本轮的后处理完成，失败只记录日志，不影响下载结果"""
+        futures, self.remux_futures = self.remux_futures, []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"后处理失败: {str(e)}")
 
-    def send_feishu_message(self):
-        """发送飞书消息"""
-        # 获取昨天的日期
-        yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y年%m月%d日')
+    def process_match(self, match):
+        """处理单场比赛"""
+        return self.finish_match(match, self.schedule_match(match))
+
+    def send_feishu_message(self, target_dates=None):
+        """把下载报告放入飞书发件箱，target_dates 默认为回看窗口"""
+        if not self.outbox:
+            return
+        # 获取回看窗口的日期范围
+        target_dates = sorted((target_dates or self.get_target_dates()).values())
+        date_range = target_dates[-1].strftime('%Y年%m月%d日')
+        if len(target_dates) > 1:
+            date_range = f"{target_dates[0].strftime('%Y年%m月%d日')} - {date_range}"
         
         # 构建消息内容
-        message = f"🏀 NBA比赛下载报告 ({yesterday})\n\n"
+        message = f"🏀 NBA比赛下载报告 ({date_range})\n\n"
         
         # 添加符合要求的比赛
         message += "📅 符合下载要求的比赛：\n"
@@ -345,155 +647,439 @@ class NBAVideoDownloader:
             message += f"总场次：{total}\n"
             message += f"成功：{success}\n"
             message += f"成功率：{success_rate:.1f}%\n"
+
+        # 添加吞吐统计
+        message += "\n⏱️ 运行统计：\n"
+        for line in self.metrics.summary_lines():
+            message += f"{line}\n"
         
-        # 发送消息到飞书
-        try:
-            payload = {
-                "msg_type": "text",
-                "content": {
-                    "text": message
-                }
-            }
-            
-            response = requests.post(FEISHU_WEBHOOK_URL, json=payload)
-            response.raise_for_status()
-            logger.info("成功发送飞书消息")
-        except Exception as e:
-            logger.error(f"发送飞书消息失败: {str(e)}")
+        # 由发件箱在后台发送，失败时重试
+        self.outbox.send(message.rstrip())
 
-    def get_matches(self):
-        """获取比赛列表"""
-        content = self.get_page_content(BASE_URL, use_selenium=True)
+    def get_listing_content(self, url):
+        """获取并解析列表页，返回 (content, 列表项)
+
+        auto 模式下 requests 获取的页面能解析出比赛时不启动浏览器
+        """
+        if BROWSER_MODE == 'auto':
+            content = self.get_page_content(url)
+            if content:
+                items = self.parse_listing(content)
+                if items:
+                    return content, items
+            logger.info("Listing not parsable from plain requests, falling back to Selenium")
+        content = self.get_page_content(url, use_selenium=True)
         if not content:
-            return []
-            
-        soup = BeautifulSoup(content, 'html.parser')
-        matches = []
-        
-        # 获取昨天的日期
-        yesterday_dates = self.get_yesterday_dates()
-        logger.info(f"Looking for matches from dates: {yesterday_dates}")
-        
-        # 保存页面内容用于调试
-        if DEBUG:
-            debug_file = os.path.join(DOWNLOAD_DIR, 'debug_page.html')
-            with open(debug_file, 'w', encoding='utf-8') as f:
-                f.write(content)
-            logger.debug(f"Saved page content to {debug_file}")
-        
-        # 查找所有比赛
-        for match_item in soup.select('.wrap-body li.c'):
-            try:
-                # 获取日期
-                date_elem = match_item.select_one('em')
-                if not date_elem:
-                    logger.debug("No date element found")
-                    continue
-                date_text = date_elem.text.strip()
-                logger.debug(f"Found date: {date_text}")
-                
-                # 获取标题和链接
-                link_elem = match_item.select_one('a[href*="/video-"]')
-                if not link_elem:
-                    logger.debug("No link element found")
-                    continue
-                    
-                title = link_elem.text.strip()
-                logger.debug(f"Found title: {title}")
-                
-                # 从标题中提取日期和球队
-                title_parts = title.split(' ')
-                if len(title_parts) < 4:  # 确保标题格式正确
+            return None, []
+        return content, self.parse_listing(content)
+
+    def parse_listing(self, content):
+        """解析列表页，计入 parse_listing 阶段的耗时"""
+        with self.metrics.stage('parse_listing'):
+            return self.parser.listing_items(content)
+
+    def listing_page_url(self, page):
+        """获取第 N 页列表页的 URL（video-pN.html）"""
+        if re.search(r'-p\d+\.html$', BASE_URL):
+            return re.sub(r'-p\d+\.html$', f'-p{page}.html', BASE_URL)
+        return urljoin(BASE_URL.rstrip('/') + '/', f'video-p{page}.html')
+
+    def parse_listing_item(self, match_item, target_dates):
+        """解析列表页中的一条比赛 (日期, 标题, 链接)，返回 (比赛信息或 None, 比赛日期)"""
+        date_text, title, href = match_item
+        logger.debug(f"Found date: {date_text}, title: {title}")
+
+        if len(title.split(' ')) < 4:  # 确保标题格式正确
+            return None, None
+
+        # 标题只解析一次：日期、球队、标签和简洁的比赛名（如 灰熊vs勇士）
+        info = self.titles.parse(title)
+        item_date = self.resolve_month_day(info.month, info.day)
+        logger.debug(f"Parsed title: {info!r}")
+
+        # 检查是否在回看窗口内以及是否是关注的球队
+        is_target = info.date_text in target_dates
+        is_team = bool(info.tracked)
+        logger.debug(f"Is target date match: {is_target}, Is team match: {is_team}")
+
+        if not (is_target and is_team):
+            return None, item_date
+
+        match = {
+            'title': info.label,
+            'url': urljoin(BASE_URL, href),
+            'date': info.date_text
+        }
+        return match, item_date
+
+    def listing_fingerprint(self, url, title):
+        """列表项指纹：详情页 URL 加标题，标题变化（如补上了国语录像）视为新条目"""
+        return hashlib.sha1(f"{url}\n{title}".encode('utf-8')).hexdigest()
+
+    def scan_listing(self, target_dates, stop_at_known=False):
+        """逐页扫描列表页，返回 (新见到的列表项, 是否完整扫描)
+
+        一页中所有比赛都早于回看窗口时停止翻页；stop_at_known 为 True 时
+        扫描到上次见过的列表项就停止，之后的条目在之前的轮询中已经处理过
+        """
+        oldest_date = min(target_dates.values())
+        entries = []
+        seen = set()  # 翻页期间列表可能整体下移，避免重复
+
+        for page in range(1, MAX_LISTING_PAGES + 1):
+            if self.cancelled:
+                return entries, False
+            url = self.listing_page_url(page)
+            content, items = self.get_listing_content(url)
+            if not content:
+                return entries, False
+
+            # 保存页面内容用于调试
+            if DEBUG:
+                debug_file = os.path.join(DOWNLOAD_DIR, f'debug_page_{page}.html')
+                with open(debug_file, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                logger.debug(f"Saved page content to {debug_file}")
+
+            if not items:
+                break
+
+            fingerprints = [self.listing_fingerprint(urljoin(BASE_URL, href), title) for _, title, href in items]
+            known = self.ledger.known_listing_items(fingerprints) if stop_at_known else set()
+            item_dates = []
+            reached_known = False
+            for (date_text, title, href), fingerprint in zip(items, fingerprints):
+                if fingerprint in known:
+                    reached_known = True
+                    break
+                if fingerprint in seen:
                     continue
-                    
-                match_date = title_parts[0]  # 例如："01月01日"
-                logger.debug(f"Extracted date from title: {match_date}")
-                
-                # 提取球队名称
-                teams = []
-                for team in TEAMS:
-                    if team in title:
-                        teams.append(team)
-                
-                # 如果找到了两支球队，创建一个更简洁的标题
-                if len(teams) >= 2:
-                    simplified_title = f"{teams[0]}vs{teams[1]}"
-                else:
-                    # 尝试从标题中提取球队名称（通常在"vs"周围）
-                    vs_index = title.find('vs')
-                    if vs_index != -1:
-                        # 在"vs"前后查找空格来提取球队名称
-                        before_vs = title[:vs_index].strip().split(' ')[-1]
-                        after_vs = title[vs_index+2:].strip().split(' ')[0]
-                        simplified_title = f"{before_vs}vs{after_vs}"
-                    else:
-                        simplified_title = title
-                
-                # 检查是否是昨天的比赛和关注的球队
-                is_yesterday = self.is_yesterday_match(match_date)
-                is_team = self.is_team_match(title)
-                logger.debug(f"Is yesterday match: {is_yesterday}, Is team match: {is_team}")
-                
-                if is_yesterday and is_team:
-                    detail_url = urljoin(BASE_URL, link_elem['href'])
-                    matches.append({
-                        'title': simplified_title,
-                        'url': detail_url,
-                        'date': match_date
-                    })
-                    logger.info(f"Found match: {simplified_title} ({match_date})")
-            
+                seen.add(fingerprint)
+                info = self.titles.parse(title)
+                item_date = self.resolve_month_day(info.month, info.day)
+                if item_date:
+                    item_dates.append(item_date)
+                entries.append({
+                    'fingerprint': fingerprint,
+                    'url': urljoin(BASE_URL, href),
+                    'href': href,
+                    'title': title,
+                    'date_text': date_text,
+                    'item_date': item_date.isoformat() if item_date else None,
+                })
+
+            if reached_known:
+                logger.debug(f"Reached last seen listing item on page {page}, stop crawling")
+                break
+            # 本页所有比赛都早于回看窗口，后面的页只会更早
+            if item_dates and max(item_dates) < oldest_date:
+                logger.debug(f"Page {page} is older than {oldest_date}, stop crawling")
+                break
+
+        return entries, True
+
+    def iter_matches(self, target_dates=None):
+        """逐个产出回看窗口内的比赛
+
+        增量模式下只扫描新出现的列表项并存入下载记录，再从下载记录中取出
+        回看窗口内尚未全部下载完成的比赛，每次轮询的开销与列表长度无关
+        """
+        target_dates = target_dates or self.get_target_dates()
+        logger.info(f"Looking for matches from dates: {list(target_dates)}")
+        entries, complete = self.scan_listing(target_dates, stop_at_known=INCREMENTAL_LISTING)
+        logger.info(f"New listing items: {len(entries)}")
+
+        if INCREMENTAL_LISTING:
+            if complete:
+                self.ledger.add_listing_items(entries)
+                self.ledger.prune_listing_items(time.time() - LISTING_RETENTION_DAYS * 86400)
+            else:
+                # 扫描中断时不记住新条目，下次重新扫描，避免漏掉后面的页
+                logger.warning("Listing scan incomplete, new items will be rescanned next time")
+            dates = sorted(target_dates.values())
+            pending = self.ledger.pending_listing_items(dates[0].isoformat(), dates[-1].isoformat())
+            entries = pending if complete else entries + pending
+
+        seen_urls = set()
+        for entry in entries:
+            try:
+                match, _ = self.parse_listing_item((entry['date_text'], entry['title'], entry['href']), target_dates)
             except Exception as e:
                 logger.error(f"Error parsing match item: {str(e)}")
                 continue
-        
+            if match and match['url'] not in seen_urls:
+                seen_urls.add(match['url'])
+                logger.info(f"Found match: {match['title']} ({match['date']})")
+                yield match
+
+    def iter_listing_range(self, target_dates, max_pages=BACKFILL_MAX_PAGES, on_page=None):
+        """逐页产出日期范围内的比赛，不经过增量扫描；翻到整页都早于开始日期时停止
+
+        每次只在内存中保留一页，适合很长的日期范围。on_page 在产出每页的比赛前以该页的比赛调用
+        """
+        oldest_date = min(target_dates.values())
+        # 翻页期间有新条目时，上一页末尾的比赛会被挤到下一页，只需与上一页去重
+        previous_urls = set()
+        for page in range(1, max_pages + 1):
+            if self.cancelled:
+                return
+            content, items = self.get_listing_content(self.listing_page_url(page))
+            if not content or not items:
+                return
+
+            item_dates = []
+            page_matches = []
+            page_urls = set()
+            for match_item in items:
+                try:
+                    match, item_date = self.parse_listing_item(match_item, target_dates)
+                except Exception as e:
+                    logger.error(f"Error parsing match item: {str(e)}")
+                    continue
+                if item_date:
+                    item_dates.append(item_date)
+                if match and match['url'] not in previous_urls and match['url'] not in page_urls:
+                    page_urls.add(match['url'])
+                    logger.info(f"Found match: {match['title']} ({match['date']})")
+                    page_matches.append(match)
+            previous_urls = page_urls
+
+            if page_matches and on_page:
+                on_page(page_matches)
+            yield from page_matches
+
+            if item_dates and max(item_dates) < oldest_date:
+                logger.debug(f"Page {page} is older than {oldest_date}, stop crawling")
+                return
+
+    def get_matches(self):
+        """获取比赛列表"""
+        matches = list(self.iter_matches())
         logger.info(f"Total matches found: {len(matches)}")
         return matches
 
-    def run(self):
-        """运行下载器"""
+    def write_run_report(self):
+        """写出 JSON 运行报告和 Prometheus textfile"""
+        with self._results_lock:
+            results = {
+                'matches': list(self.download_results['matches']),
+                'success': list(self.download_results['success']),
+                'failed': list(self.download_results['failed']),
+                'errors': dict(self.download_results['errors']),
+            }
+        for line in self.metrics.summary_lines():
+            logger.info(line)
+        try:
+            if METRICS_REPORT_PATH:
+                self.metrics.write_json(METRICS_REPORT_PATH, results)
+            if METRICS_PROMETHEUS_PATH:
+                self.metrics.write_prometheus(METRICS_PROMETHEUS_PATH, {
+                    'found': len(results['matches']),
+                    'success': len(results['success']),
+                    'failed': len(results['failed']),
+                })
+            logger.debug(f"Run report written to {METRICS_REPORT_PATH}")
+        except OSError as e:
+            logger.error(f"写出运行报告失败: {str(e)}")
+
+    def log_summary(self, total_matches, successful_downloads):
+        """输出下载任务总结"""
+        logger.info("=== 下载任务总结 ===")
+        logger.info(f"今日符合要求的比赛数量: {total_matches}")
+        logger.info(f"成功下载的比赛数量: {successful_downloads}")
+        if total_matches:
+            logger.info(f"下载成功率: {(successful_downloads/total_matches*100):.1f}% 如果成功率较低，请检查日志中的详细错误信息")
+        logger.info("================")
+
+    def run(self, notify_idle=True):
+        """运行下载器
+
+        notify_idle 为 False 时（常驻模式），本轮没有新的下载就不发送飞书消息
+        """
+        self.metrics = RunMetrics()
+        # 常驻模式下同一个下载器会运行多次，每次重新统计
+        with self._results_lock:
+            self.download_results = {'matches': [], 'success': [], 'failed': [], 'errors': {}}
         try:
             logger.info("Starting NBA video downloader")
             logger.info(f"Base URL: {BASE_URL}")
             logger.info(f"Download directory: {DOWNLOAD_DIR}")
-            logger.info(f"Teams to track: {TEAMS}")
+            logger.info(f"Teams to track: {self.teams}")
+            if len(self.profiles) > 1:
+                for profile in self.profiles:
+                    logger.info(f"Profile {profile.name}: {profile.teams}, {profile.quality}, {profile.download_dir}")
 
             # 获取比赛列表
             matches = self.get_matches()
             if not matches:
                 logger.info("No matches found")
-                self.send_feishu_message()  # 即使没有比赛也发送消息
+                self.write_run_report()
+                if notify_idle and not self.cancelled:
+                    self.send_feishu_message()  # 即使没有比赛也发送消息
                 return
 
             # 记录所有符合条件的比赛
-            self.download_results['matches'] = [match['title'] for match in matches]
+            self.download_results['matches'] = [self.match_name(match) for match in matches]
             
             total_matches = len(matches)
-            successful_downloads = 0
+            self.enforce_retention(matches)
 
-            for match in matches:
-                if self.process_match(match):
-                    successful_downloads += 1
+            # 并发解析所有详情页，解析完成的比赛立即加入全局下载队列（按优先级下载）
+            with ThreadPoolExecutor(max_workers=max(MAX_RESOLVE_WORKERS, 1), thread_name_prefix='resolve') as resolver:
+                resolve_futures = [resolver.submit(self.resolve_match, match) for match in matches]
+                scheduled = []
+                for future in as_completed(resolve_futures):
+                    match = future.result()
+                    if not self.cancelled:
+                        scheduled.append((match, self.schedule_match(match)))
+            # 按下载优先级等待，先下完的比赛先开始后处理，与后续比赛的下载重叠
+            scheduled.sort(key=lambda item: self.match_priority(item[0]))
+            results = [self.finish_match(match, job) for match, job in scheduled]
+            successful_downloads = sum(1 for result in results if result)
+            self.wait_remux()
 
-            # 添加总结日志
-            logger.info("=== 下载任务总结 ===")
-            logger.info(f"今日符合要求的比赛数量: {total_matches}")
-            logger.info(f"成功下载的比赛数量: {successful_downloads}")
-            logger.info(f"下载成功率: {(successful_downloads/total_matches*100):.1f}% 如果成功率较低，请检查日志中的详细错误信息")
-            logger.info("================")
+            self.log_summary(total_matches, successful_downloads)
+            self.write_run_report()
 
-            # 发送飞书消息
-            self.send_feishu_message()
+            # 被停止时不发送报告；常驻模式下只在本轮有新的下载时发送
+            if self.cancelled:
+                logger.info("下载已取消，未完成的视频下次继续")
+            elif notify_idle or 'download' in self.metrics.stages():
+                self.send_feishu_message()
 
         except Exception as e:
             logger.error(f"Error running downloader: {str(e)}")
             if DEBUG:
                 raise
 
+    def backfill(self, start, end):
+        """补下载 [start, end] 内关注球队的比赛
+
+        列表页、详情页解析和下载三个阶段用有界队列串联，比赛边发现边下载，
+        内存和连接数与日期范围长短无关；已完成的下载记录在下载记录中，重复运行会跳过
+        """
+        self.metrics = RunMetrics()
+        with self._results_lock:
+            self.download_results = {'matches': [], 'success': [], 'failed': [], 'errors': {}}
+        logger.info(f"Backfilling {start} - {end} for teams: {self.teams}")
+
+        # 流水线中还没处理完的比赛（数量受有界队列限制），清理旧目录时不删除
+        pending = {}
+
+        def enforce_retention(page_matches):
+            # 与 run() 一样在下载前清理旧目录，每页清理一次
+            with self._results_lock:
+                for match in page_matches:
+                    pending[match['url']] = match
+                protected = list(pending.values())
+            self.enforce_retention(protected)
+
+        def record_match(match):
+            with self._results_lock:
+                self.download_results['matches'].append(self.match_name(match))
+            return match
+
+        def finished(match):
+            with self._results_lock:
+                pending.pop(match['url'], None)
+
+        def download(match):
+            try:
+                if self.cancelled:
+                    return False
+                return self.finish_match(match, self.schedule_match(match))
+            finally:
+                finished(match)
+
+        def resolve_failed(match, error):
+            if self._failed_stage(match, error):
+                if match:
+                    finished(match)
+                return True
+            return False
+
+        target_dates = self.get_date_range(start, end)
+        matches = (record_match(match)
+                   for match in self.iter_listing_range(target_dates, on_page=enforce_retention))
+        resolved = bounded_map(self.resolve_match, matches, MAX_RESOLVE_WORKERS, name='resolve')
+        resolved_matches = (resolved_match for match, resolved_match, error in resolved
+                            if not resolve_failed(match, error))
+        # 每个下载线程同时只处理一场比赛，排队中的比赛数有上限
+        downloaded = bounded_map(download, resolved_matches, MAX_ACTIVE_DOWNLOADS, name='backfill')
+
+        successful_downloads = 0
+        for match, ok, error in downloaded:
+            if not self._failed_stage(match, error) and ok:
+                successful_downloads += 1
+        self.wait_remux()
+
+        total_matches = len(self.download_results['matches'])
+        self.log_summary(total_matches, successful_downloads)
+        self.write_run_report()
+        if self.cancelled:
+            logger.info("补下载已取消，未完成的视频下次继续")
+        elif total_matches:
+            self.send_feishu_message(target_dates)
+        return successful_downloads
+
+    def _failed_stage(self, match, error):
+        """记录流水线阶段中抛出的异常，返回是否失败"""
+        if error is None:
+            return False
+        logger.error(f"处理比赛时发生错误: {str(error)}")
+        if match:
+            self.record_failure(match, str(error))
+        return True
+
+
+def parse_date(text):
+    """解析命令行中的日期: 2024-01-05"""
+    try:
+        return datetime.strptime(text, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日期格式应为 YYYY-MM-DD: {text}")
+
+
 def main():
     """Entry point for the application."""
-    downloader = NBAVideoDownloader()
-    downloader.run()
+    parser = argparse.ArgumentParser(description='下载关注球队的 NBA 比赛录像')
+    parser.add_argument('--daemon', action='store_true',
+                        help='常驻运行，按 DAEMON_POLL_INTERVAL / DAEMON_POLL_PROFILES 定期检查新录像')
+    parser.add_argument('--backfill', nargs=2, type=parse_date, metavar=('START', 'END'),
+                        help='补下载日期范围内的比赛（YYYY-MM-DD），如停机一周后或新增关注球队时')
+    parser.add_argument('--teams', nargs='+', metavar='TEAM', help='只处理这些球队（默认使用配置中的 TEAMS）')
+    parser.add_argument('--profile', nargs='+', metavar='NAME', help='只处理这些订阅（默认为 PROFILES 中的全部订阅）')
+    args = parser.parse_args()
+
+    if args.backfill:
+        start, end = args.backfill
+        if start > end:
+            parser.error('START 不能晚于 END')
+        # 列表页标题中的日期不带年份，只能识别一年以内的比赛
+        if end >= date.today() or start <= date.today() - timedelta(days=365):
+            parser.error('日期范围需要在过去一年内，且不包括今天')
+
+    try:
+        profiles = load_profiles(PROFILES, TEAMS, PREFERRED_QUALITY, DOWNLOAD_DIR, names=args.profile)
+    except ValueError as e:
+        parser.error(str(e))
+
+    listener = setup_logging(LOG_FILE, logging.DEBUG if DEBUG else logging.INFO, LOG_MAX_BYTES, LOG_BACKUP_COUNT)
+    try:
+        with NBAVideoDownloader(teams=args.teams, profiles=profiles) as downloader:
+            if args.backfill:
+                # 收到 SIGTERM / Ctrl-C 时保存下载进度后退出
+                for signum in (signal.SIGTERM, signal.SIGINT):
+                    signal.signal(signum, lambda signum, frame: downloader.cancel())
+                downloader.backfill(*args.backfill)
+            elif args.daemon:
+                daemon = Daemon(downloader, DAEMON_POLL_INTERVAL, DAEMON_POLL_PROFILES)
+                daemon.install_signal_handlers()
+                daemon.run_forever()
+            else:
+                downloader.run()
+    finally:
+        listener.stop()  # 写完队列中剩余的日志
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,215 @@
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import requests
+
+from nba_downloader.retry import PERMANENT, THROTTLED, RetryPolicy, PermanentError, classify, retry_after
+
+logger = logging.getLogger(__name__)
+
+# 飞书机器人限流的错误码，其余非 0 错误码（签名错误、消息格式错误等）重试也不会成功
+FEISHU_THROTTLED_CODES = {9499, 11232}
+
+
+class FeishuThrottled(Exception):
+    """飞书返回限流错误码"""
+
+
+class FeishuOutbox:
+    """飞书消息发件箱：消息先写入磁盘，由后台线程发送
+
+    - 发送失败（超时、网络错误、限流）时按 RetryPolicy 退避重试，消息保留在磁盘上，
+      进程退出时没发出的消息在下次运行时继续发送，超过 max_age 的消息丢弃
+    - 短时间内的多条消息（如同时下载完成的几场比赛）合并为一条发送；同一 key 的
+      消息只发送最新的一条
+    - 每次请求都有超时，webhook 不可用时不会卡住下载
+    """
+
+    def __init__(self, webhook_url: str, spool_dir: str, timeout=(5, 10), retry_policy: Optional[RetryPolicy] = None,
+                 coalesce_delay: float = 10, max_age: float = 3 * 24 * 60 * 60, max_chars: int = 4000,
+                 session: Optional[requests.Session] = None):
+        self.webhook_url = webhook_url
+        self.spool_dir = spool_dir
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy(base_delay=10, max_delay=600)
+        self.coalesce_delay = coalesce_delay  # 第一条消息到达后等待多久再发送，期间的消息合并
+        self.max_age = max_age  # 消息最长保留时间（秒）
+        self.max_chars = max_chars  # 合并后每条消息的最大字符数
+        self.session = session or requests.Session()
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._queued = False  # 有新消息或需要重试
+        self._idle = True  # 发件箱已清空
+        self._flushing = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(spool_dir, exist_ok=True)
+        if self._spooled():
+            # 上次运行没发出的消息
+            self._wake()
+
+    def send(self, text: str, key: Optional[str] = None):
+        """把消息写入发件箱后立即返回；key 相同的未发送消息只保留最新的一条"""
+        message = {'text': text, 'key': key, 'created': time.time()}
+        name = f"{time.time_ns():020d}-{os.getpid()}-{next(self._counter)}.json"
+        path = os.path.join(self.spool_dir, name)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(message, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"写入飞书消息失败: {str(e)}")
+            return
+        self._wake()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """不再等待合并，立即发送发件箱中的消息，最多等待 timeout 秒，返回是否全部发出"""
+        with self._condition:
+            if self._idle:
+                return True
+            self._flushing += 1
+            self._condition.notify_all()
+            try:
+                return self._condition.wait_for(lambda: self._idle, timeout)
+            finally:
+                self._flushing -= 1
+
+    def close(self, timeout: Optional[float] = None):
+        """最多等待 timeout 秒发送剩余消息，之后停止后台线程；没发出的消息下次运行时发送"""
+        if not self.flush(timeout):
+            logger.warning(f"{len(self._spooled())} 条飞书消息未发出，下次运行时重试")
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout=1)
+        self.session.close()
+
+    def _wake(self):
+        with self._condition:
+            self._queued = True
+            self._idle = False
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='notify', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def _spooled(self) -> List[str]:
+        try:
+            return sorted(name for name in os.listdir(self.spool_dir) if name.endswith('.json'))
+        except OSError:
+            return []
+
+    def _load(self) -> List[Tuple[List[str], str]]:
+        """读取发件箱，丢弃过期的消息，返回 [(文件路径, 正文)]，同一 key 的旧消息随新消息一起删除"""
+        messages = []
+        latest = {}
+        for name in self._spooled():
+            path = os.path.join(self.spool_dir, name)
+            try:
+                with open(path, encoding='utf-8') as f:
+                    message = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"飞书消息文件损坏，丢弃 {name}: {str(e)}")
+                self._remove([path])
+                continue
+            if time.time() - message.get('created', 0) > self.max_age:
+                logger.warning(f"飞书消息超过 {self.max_age / 3600:.0f} 小时未发出，丢弃")
+                self._remove([path])
+                continue
+            key = message.get('key')
+            if key in latest:
+                # 同一 key 只发送最新的消息，旧的文件在新消息发出后删除
+                paths, _ = messages[latest[key]]
+                messages[latest[key]] = None
+                paths = paths + [path]
+            else:
+                paths = [path]
+            if key:
+                latest[key] = len(messages)
+            messages.append((paths, message['text']))
+        return [message for message in messages if message]
+
+    def _batches(self, messages: List[Tuple[List[str], str]]) -> List[Tuple[List[str], str]]:
+        """按顺序把消息合并为不超过 max_chars 的几批"""
+        batches = []
+        for paths, text in messages:
+            if batches and len(batches[-1][1]) + len(text) + 2 <= self.max_chars:
+                batches[-1] = (batches[-1][0] + paths, f"{batches[-1][1]}\n\n{text}")
+            else:
+                batches.append((paths, text))
+        return batches
+
+    def _post(self, text: str):
+        payload = {"msg_type": "text", "content": {"text": text}}
+        response = self.session.post(self.webhook_url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        try:
+            result = response.json()
+        except ValueError:
+            return
+        # 飞书在 HTTP 200 中用 code（旧版为 StatusCode）返回错误
+        code = result.get('code', result.get('StatusCode', 0)) if isinstance(result, dict) else 0
+        if code in FEISHU_THROTTLED_CODES:
+            raise FeishuThrottled(f"飞书限流: {result.get('msg')}")
+        if code:
+            raise PermanentError(f"飞书返回错误 {code}: {result.get('msg')}")
+
+    @staticmethod
+    def _remove(paths: List[str]):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _run(self):
+        failures = 0
+        retry_at = 0.0
+        while True:
+            with self._condition:
+                # 等待新消息或重试时间
+                while not self._closed:
+                    wait = retry_at - time.monotonic()
+                    if self._queued and wait <= 0:
+                        break
+                    self._condition.wait(wait if wait > 0 else None)
+                if self._closed:
+                    return
+                # 等待其他消息一起发送，flush 时立即发送
+                if not failures:
+                    self._condition.wait_for(lambda: self._closed or self._flushing, self.coalesce_delay)
+                self._queued = False
+
+            failed = False
+            for paths, text in self._batches(self._load()):
+                try:
+                    self._post(text)
+                except Exception as e:
+                    kind = THROTTLED if isinstance(e, FeishuThrottled) else classify(e)
+                    if kind == PERMANENT:
+                        logger.error(f"发送飞书消息失败，丢弃: {str(e)}")
+                        self._remove(paths)
+                        continue
+                    failures += 1
+                    delay = self.retry_policy.delay(kind, failures, retry_after(e))
+                    logger.warning(f"发送飞书消息失败，{delay:.0f} 秒后重试: {str(e)}")
+                    retry_at = time.monotonic() + delay
+                    failed = True
+                    break
+                failures = 0
+                self._remove(paths)
+                logger.info("成功发送飞书消息")
+
+            with self._condition:
+                if failed:
+                    self._queued = True
+                elif not self._queued:
+                    self._idle = True
+                    self._condition.notify_all()
@@ -0,0 +1,210 @@
+import logging
+import re
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+    from selectolax.lexbor import LexborHTMLParser
+
+# 只检查是否安装，解析库在创建解析器时才导入
+LXML_AVAILABLE = find_spec('lxml') is not None
+SELECTOLAX_AVAILABLE = find_spec('selectolax') is not None
+
+logger = logging.getLogger(__name__)
+
+# 页面选择器
+LISTING_ITEM_SELECTOR = '.wrap-body li.c'
+LISTING_DATE_SELECTOR = 'em'
+LISTING_LINK_SELECTOR = 'a[href*="/video-"]'
+WEIBO_LINK_SELECTOR = '#lx li.cd a, #jj li.cd a'
+
+# 流式模式下相关子树的起始位置
+LISTING_START = re.compile(r'<[a-zA-Z]+[^>]*\sclass=["\'][^"\']*\bwrap-body\b')
+DETAIL_START = re.compile(r'<[a-zA-Z]+[^>]*\sid=["\'](?:lx|jj)["\']')
+
+# 列表项: (日期文本, 标题, 链接)；视频链接: (链接文字, 链接)
+ListingItem = Tuple[str, str, str]
+VideoLink = Tuple[str, str]
+
+
+def _relevant_subtree(content: str, pattern) -> str:
+    """截掉相关子树之前的内容（<head>、导航等），找不到时返回整页"""
+    match = pattern.search(content)
+    return content[match.start():] if match else content
+
+
+class PageParser:
+    """页面解析器基类，各后端实现列表页和详情页的提取"""
+
+    name = 'base'
+
+    def __init__(self, streaming: bool = False):
+        self.streaming = streaming  # 只扫描相关子树
+
+    def listing_items(self, content: str) -> List[ListingItem]:
+        """提取列表页中的比赛，缺少日期或链接的条目会被跳过"""
+        raise NotImplementedError
+
+    def weibo_links(self, content: str) -> List[VideoLink]:
+        """提取详情页中的录像链接"""
+        raise NotImplementedError
+
+
+class SoupParser(PageParser):
+    """BeautifulSoup 后端（html.parser），没有安装更快的解析库时使用"""
+
+    name = 'bs4'
+
+    def __init__(self, streaming: bool = False):
+        super().__init__(streaming)
+        from bs4 import BeautifulSoup, SoupStrainer
+        self._BeautifulSoup = BeautifulSoup
+        # 流式模式下只为相关容器建树（class 在建树时尚未按空格拆分，用正则匹配）
+        self.listing_strainer = SoupStrainer(class_=re.compile(r'(^|\s)wrap-body(\s|$)'))
+        self.detail_strainer = SoupStrainer(id=['lx', 'jj'])
+
+    def _soup(self, content: str, pattern, strainer) -> 'BeautifulSoup':
+        if self.streaming:
+            return self._BeautifulSoup(_relevant_subtree(content, pattern), 'html.parser', parse_only=strainer)
+        return self._BeautifulSoup(content, 'html.parser')
+
+    def listing_items(self, content: str) -> List[ListingItem]:
+        soup = self._soup(content, LISTING_START, self.listing_strainer)
+        items = []
+        for match_item in soup.select(LISTING_ITEM_SELECTOR):
+            date_elem = match_item.select_one(LISTING_DATE_SELECTOR)
+            link_elem = match_item.select_one(LISTING_LINK_SELECTOR)
+            if date_elem and link_elem:
+                items.append((date_elem.text.strip(), link_elem.text.strip(), link_elem['href']))
+        return items
+
+    def weibo_links(self, content: str) -> List[VideoLink]:
+        soup = self._soup(content, DETAIL_START, self.detail_strainer)
+        return [(a.text, a.get('href', '')) for a in soup.select(WEIBO_LINK_SELECTOR)]
+
+
+class LxmlParser(PageParser):
+    """lxml 后端，使用预编译的 XPath；流式模式下边读边解析并及时释放已处理的节点"""
+
+    name = 'lxml'
+
+    _CLASS = "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, streaming: bool = False):
+        super().__init__(streaming)
+        from lxml import etree
+        self.etree = etree
+        _class = self._CLASS.format
+        self.LISTING_ITEMS = etree.XPath(f"//*[{_class('wrap-body')}]//li[{_class('c')}]")
+        self.LISTING_DATE = etree.XPath('.//em')
+        self.LISTING_LINK = etree.XPath(".//a[contains(@href, '/video-')]")
+        self.WEIBO_LINKS = etree.XPath(f"//*[@id='lx' or @id='jj']//li[{_class('cd')}]//a")
+        self.ITEM_LINKS = etree.XPath('.//a')
+        self.IN_LISTING = etree.XPath(f"ancestor::*[{_class('wrap-body')}]")
+        self.IN_DETAIL = etree.XPath("ancestor::*[@id='lx' or @id='jj']")
+
+    @staticmethod
+    def _text(element) -> str:
+        return ''.join(element.itertext())
+
+    def _listing_item(self, match_item) -> Optional[ListingItem]:
+        date_elems = self.LISTING_DATE(match_item)
+        link_elems = self.LISTING_LINK(match_item)
+        if not date_elems or not link_elems:
+            return None
+        link_elem = link_elems[0]
+        return self._text(date_elems[0]).strip(), self._text(link_elem).strip(), link_elem.get('href')
+
+    def _iter_li(self, content: str, pattern):
+        """流式解析相关子树，逐个产出已闭合的 li 节点，处理后清空以控制内存"""
+        parser = self.etree.HTMLPullParser(events=('end',), tag='li')
+        subtree = _relevant_subtree(content, pattern)
+        for start in range(0, len(subtree), self.CHUNK_SIZE):
+            parser.feed(subtree[start:start + self.CHUNK_SIZE])
+            for _, element in parser.read_events():
+                yield element
+                element.clear(keep_tail=True)
+        parser.close()
+        for _, element in parser.read_events():
+            yield element
+
+    def listing_items(self, content: str) -> List[ListingItem]:
+        if self.streaming:
+            match_items = (
+                element for element in self._iter_li(content, LISTING_START)
+                if 'c' in (element.get('class') or '').split() and self.IN_LISTING(element)
+            )
+        else:
+            root = self.etree.HTML(content)
+            match_items = self.LISTING_ITEMS(root) if root is not None else []
+        items = []
+        for match_item in match_items:
+            item = self._listing_item(match_item)
+            if item:
+                items.append(item)
+        return items
+
+    def weibo_links(self, content: str) -> List[VideoLink]:
+        if self.streaming:
+            links = []
+            for element in self._iter_li(content, DETAIL_START):
+                if 'cd' in (element.get('class') or '').split() and self.IN_DETAIL(element):
+                    links.extend((self._text(a), a.get('href', '')) for a in self.ITEM_LINKS(element))
+            return links
+        root = self.etree.HTML(content)
+        if root is None:
+            return []
+        return [(self._text(a), a.get('href', '')) for a in self.WEIBO_LINKS(root)]
+
+
+class SelectolaxParser(PageParser):
+    """selectolax（lexbor）后端，整页解析本身就很快，流式模式只截掉无关的页头"""
+
+    name = 'selectolax'
+
+    def __init__(self, streaming: bool = False):
+        super().__init__(streaming)
+        from selectolax.lexbor import LexborHTMLParser
+        self._LexborHTMLParser = LexborHTMLParser
+
+    def _tree(self, content: str, pattern) -> 'LexborHTMLParser':
+        # 截断后的片段里仍保留 #lx / .wrap-body 容器本身，选择器不受影响
+        return self._LexborHTMLParser(_relevant_subtree(content, pattern) if self.streaming else content)
+
+    def listing_items(self, content: str) -> List[ListingItem]:
+        items = []
+        for match_item in self._tree(content, LISTING_START).css(LISTING_ITEM_SELECTOR):
+            date_elem = match_item.css_first(LISTING_DATE_SELECTOR)
+            link_elem = match_item.css_first(LISTING_LINK_SELECTOR)
+            if date_elem and link_elem:
+                items.append((date_elem.text().strip(), link_elem.text().strip(), link_elem.attributes.get('href')))
+        return items
+
+    def weibo_links(self, content: str) -> List[VideoLink]:
+        tree = self._tree(content, DETAIL_START)
+        return [(a.text(), a.attributes.get('href') or '') for a in tree.css(WEIBO_LINK_SELECTOR)]
+
+
+def get_parser(name: str = 'auto', streaming: bool = False) -> PageParser:
+    """按名称获取解析器，'auto' 时依次选择 selectolax、lxml、BeautifulSoup 中第一个可用的"""
+    available = {
+        'selectolax': SELECTOLAX_AVAILABLE,
+        'lxml': LXML_AVAILABLE,
+        'bs4': True,
+    }
+    parsers = {
+        'selectolax': SelectolaxParser,
+        'lxml': LxmlParser,
+        'bs4': SoupParser,
+    }
+    if name == 'auto':
+        name = next(candidate for candidate in ('selectolax', 'lxml', 'bs4') if available[candidate])
+    elif name not in parsers:
+        raise ValueError(f"Unknown HTML parser: {name}")
+    elif not available[name]:
+        logger.warning(f"HTML parser {name} not installed, falling back to BeautifulSoup")
+        name = 'bs4'
+    logger.debug(f"Using HTML parser: {name} (streaming={streaming})")
+    return parsers[name](streaming=streaming)
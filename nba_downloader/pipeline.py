@@ -0,0 +1,78 @@
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+_DONE = object()
+
+
+def bounded_map(fn: Callable[[Any], Any], items: Iterable[Any], workers: int, buffer: Optional[int] = None,
+                name: str = 'stage') -> Iterator[Tuple[Any, Any, Optional[BaseException]]]:
+    """用 workers 个线程对 items 执行 fn，按完成顺序产出 (item, 结果, 异常)
+
+    items 按需拉取，输入和输出都是有界队列：无论输入流多长，同时在处理或等待的 item
+    不超过 workers + 2 * buffer 个，多个阶段可以串联成流水线。提前关闭生成器时停止拉取新的 item。
+    """
+    workers = max(workers, 1)
+    buffer = max(buffer or workers, 1)
+    inputs: queue.Queue = queue.Queue(maxsize=buffer)
+    outputs: queue.Queue = queue.Queue(maxsize=buffer)
+    stop = threading.Event()
+
+    def put(q: queue.Queue, value) -> bool:
+        # 下游停止后不再阻塞在满队列上
+        while not stop.is_set():
+            try:
+                q.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def feed():
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                if not put(inputs, item):
+                    return
+        except Exception as e:
+            put(outputs, (None, None, e))
+        finally:
+            # 上游也是流水线阶段时一并停止
+            if hasattr(iterator, 'close'):
+                iterator.close()
+            for _ in range(workers):
+                put(inputs, _DONE)
+
+    def work():
+        try:
+            while not stop.is_set():
+                try:
+                    item = inputs.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    return
+                try:
+                    result = (item, fn(item), None)
+                except Exception as e:
+                    result = (item, None, e)
+                if not put(outputs, result):
+                    return
+        finally:
+            put(outputs, _DONE)
+
+    threads = [threading.Thread(target=feed, name=f'{name}-feed', daemon=True)]
+    threads += [threading.Thread(target=work, name=f'{name}-{index}', daemon=True) for index in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    remaining = workers
+    try:
+        while remaining:
+            result = outputs.get()
+            if result is _DONE:
+                remaining -= 1
+                continue
+            yield result
+    finally:
+        stop.set()
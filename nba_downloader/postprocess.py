@@ -0,0 +1,131 @@
+import logging
+import os
+import re
+import shutil
+import struct
+import subprocess
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 录像文件名中的节数: 灰熊vs勇士_第1节 / 灰熊vs勇士_第OT节
+QUARTER_PATTERN = re.compile(r'_第(\d|OT)节$')
+
+
+def is_faststart(path: str) -> bool:
+    """检查文件是否是 moov 在 mdat 之前的 MP4（可以直接边下边播 / 快速拖动）"""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return False
+                size, box_type = struct.unpack('>I4s', header)
+                if box_type == b'moov':
+                    return True
+                if box_type == b'mdat':
+                    return False
+                if size == 1:
+                    size = struct.unpack('>Q', f.read(8))[0] - 16
+                elif size == 0:
+                    return False
+                else:
+                    size -= 8
+                if size < 0:
+                    return False
+                f.seek(size, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return False
+
+
+def quarter_key(path: str):
+    """节的排序键：第1节到第4节，加时在最后"""
+    match = QUARTER_PATTERN.search(os.path.splitext(os.path.basename(path))[0])
+    quarter = match.group(1) if match else ''
+    return (0, int(quarter)) if quarter.isdigit() else (1, quarter)
+
+
+class Remuxer:
+    """下载完成后用 ffmpeg 重新封装（只复制流，不转码）
+
+    每个录像封装为 moov 在前的 MP4（-movflags +faststart），可选用 concat demuxer
+    把各节拼接成一个全场文件。在独立的线程池中运行，与后续比赛的下载重叠。
+    """
+
+    def __init__(self, ffmpeg: str = 'ffmpeg', workers: int = 1, concat: bool = False,
+                 full_game_suffix: str = '全场'):
+        self.ffmpeg = shutil.which(ffmpeg) or ffmpeg
+        self.concat = concat
+        self.full_game_suffix = full_game_suffix
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='remux')
+
+    @property
+    def available(self) -> bool:
+        return shutil.which(self.ffmpeg) is not None
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """在后处理线程池中运行 fn(*args)"""
+        return self._executor.submit(fn, *args)
+
+    def process(self, match_dir: str, paths: List[str], base_filename: str) -> List[str]:
+        """重新封装比赛的所有录像，按需拼接全场，返回处理后的文件列表"""
+        outputs = [self.remux(path) for path in paths]
+        quarters = sorted((path for path in outputs if QUARTER_PATTERN.search(os.path.splitext(path)[0])),
+                          key=quarter_key)
+        if self.concat and len(quarters) > 1:
+            full_game = os.path.join(match_dir, f"{base_filename}_{self.full_game_suffix}.mp4")
+            self.concat_files(quarters, full_game)
+            outputs.append(full_game)
+        return outputs
+
+    def _run(self, cmd: List[str]):
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg 失败 ({result.returncode}): {result.stderr.strip()[-500:]}")
+
+    def remux(self, path: str) -> str:
+        """封装为 faststart MP4，返回输出路径；已经是 faststart MP4 的直接跳过"""
+        stem, ext = os.path.splitext(path)
+        output = f"{stem}.mp4"
+        if ext.lower() == '.mp4' and is_faststart(path):
+            return path
+
+        tmp_output = f"{stem}.remux.mp4"
+        self._run([
+            self.ffmpeg, '-y', '-loglevel', 'error', '-i', path,
+            '-map', '0', '-c', 'copy', '-movflags', '+faststart', '-f', 'mp4', tmp_output,
+        ])
+        os.replace(tmp_output, output)
+        if path != output:
+            os.remove(path)
+        logger.info(f"已重新封装: {os.path.basename(output)}")
+        return output
+
+    def concat_files(self, paths: List[str], output: str) -> Optional[str]:
+        """用 concat demuxer 拼接为一个文件（只复制流），已是最新时跳过"""
+        if os.path.exists(output) and os.path.getmtime(output) >= max(os.path.getmtime(path) for path in paths):
+            return output
+
+        # concat 列表中的路径需要转义单引号
+        fd, list_path = tempfile.mkstemp(suffix='.txt', dir=os.path.dirname(output))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for path in paths:
+                    escaped = os.path.abspath(path).replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+            tmp_output = f"{os.path.splitext(output)[0]}.remux.mp4"
+            self._run([
+                self.ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path,
+                '-map', '0', '-c', 'copy', '-movflags', '+faststart', '-f', 'mp4', tmp_output,
+            ])
+            os.replace(tmp_output, output)
+        finally:
+            os.remove(list_path)
+        logger.info(f"已拼接全场录像: {os.path.basename(output)}")
+        return output
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False):
+        """停止线程池，cancel_pending 为 True 时丢弃还没开始的任务"""
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_pending)
@@ -0,0 +1,76 @@
+import os
+import shutil
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from nba_downloader.match_info import TitleParser
+
+
+class Profile:
+    """一个订阅：关注的球队、清晰度和下载目录"""
+
+    __slots__ = ('name', 'teams', 'quality', 'download_dir', 'titles')
+
+    def __init__(self, name: str, teams: Sequence[str], quality: str, download_dir: str):
+        self.name = name
+        self.teams = list(teams)
+        self.quality = quality
+        self.download_dir = download_dir
+        self.titles = TitleParser(self.teams)  # 比赛名按本订阅关注的球队生成
+
+    def wants(self, title: str) -> bool:
+        """标题中是否有本订阅关注的球队"""
+        return self.titles.is_tracked(title)
+
+    def __repr__(self):
+        return f"Profile({self.name}, teams={self.teams}, {self.quality}, {self.download_dir})"
+
+
+def load_profiles(configs: Optional[Iterable[Dict[str, Any]]], teams: Sequence[str], quality: str,
+                  download_dir: str, names: Optional[Sequence[str]] = None) -> List[Profile]:
+    """按 PROFILES 配置创建订阅，未填写的项使用全局的 TEAMS / PREFERRED_QUALITY / DOWNLOAD_DIR；
+    没有配置时只有一个使用全局配置的订阅。names 不为空时只保留这些订阅"""
+    profiles = []
+    for config in configs or [{'name': 'default'}]:
+        name = config.get('name')
+        if not name:
+            raise ValueError(f"订阅缺少 name: {config}")
+        if any(profile.name == name for profile in profiles):
+            raise ValueError(f"订阅名称重复: {name}")
+        profile = Profile(name, config.get('teams') or teams, config.get('quality') or quality,
+                          config.get('download_dir') or download_dir)
+        # 同一目录中的比赛目录和文件名只由比赛决定，不同清晰度会写同一个文件
+        for other in profiles:
+            if other.quality != profile.quality and \
+                    os.path.abspath(other.download_dir) == os.path.abspath(profile.download_dir):
+                raise ValueError(f"订阅 {other.name} 和 {name} 的清晰度不同，不能使用同一个下载目录，"
+                                 f"请为其中一个设置 download_dir")
+        profiles.append(profile)
+    if names:
+        unknown = set(names) - {profile.name for profile in profiles}
+        if unknown:
+            raise ValueError(f"没有这些订阅: {', '.join(sorted(unknown))}")
+        profiles = [profile for profile in profiles if profile.name in names]
+    return profiles
+
+
+def all_teams(profiles: Iterable[Profile]) -> List[str]:
+    """所有订阅关注的球队，按订阅和 TEAMS 中的顺序去重"""
+    teams = []
+    for profile in profiles:
+        teams.extend(team for team in profile.teams if team not in teams)
+    return teams
+
+
+def share_file(source: str, target: str):
+    """让 target 与 source 内容相同：优先硬链接（不占额外空间），跨文件系统等不支持时复制；
+    已经是同一个文件时跳过"""
+    if os.path.exists(target) and os.path.samefile(source, target):
+        return
+    tmp_path = f"{target}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copy2(source, tmp_path)
+    os.replace(tmp_path, target)
@@ -0,0 +1,192 @@
+import logging
+import os
+import queue
+import re
+import selectors
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+# you_get 的进度条:  45.3% ( 12.3/ 27.1MB) ├████────┤[1/1]    2 MB/s
+YOU_GET_PROGRESS = re.compile(
+    r'(?P<percent>\d+(?:\.\d+)?)%\s*\(\s*(?P<done>[\d.]+)\s*/\s*(?P<total>[\d.]+)\s*(?P<size_unit>[KMG]?B)\)'
+    r'(?:.*?(?P<speed>[\d.]+)\s*(?P<speed_unit>[kKMG]?B)/s)?',
+)
+LINE_BREAK = re.compile(rb'\r\n|\r|\n')
+
+
+class ProgressEvent:
+    """一次下载进度: stage 为 'start' / 'progress' / 'done' / 'failed' / 'cancelled'，字节数未知时为 None"""
+
+    __slots__ = ('filename', 'backend', 'stage', 'downloaded', 'total', 'speed', 'timestamp')
+
+    def __init__(self, filename: str, backend: str, stage: str, downloaded: int = 0, total: Optional[int] = None,
+                 speed: Optional[float] = None, timestamp: Optional[float] = None):
+        self.filename = filename
+        self.backend = backend
+        self.stage = stage
+        self.downloaded = downloaded
+        self.total = total
+        self.speed = speed  # 字节/秒
+        self.timestamp = timestamp or time.time()
+
+    @property
+    def percent(self) -> Optional[float]:
+        return self.downloaded * 100 / self.total if self.total else None
+
+    def __repr__(self):
+        return f"ProgressEvent({self.filename}, {self.backend}, {self.stage}, {self.downloaded}/{self.total})"
+
+
+class ProgressHub:
+    """把下载进度分发给订阅者
+
+    publish 只在内存中记录事件并唤醒分发线程，不会因为订阅者处理慢而拖慢下载；
+    订阅者来不及处理时，同一文件的 'progress' 事件只保留最新的一个。
+    没有订阅者时不启动分发线程。
+    """
+
+    def __init__(self):
+        self._subscribers: List[Callable[[ProgressEvent], None]] = []
+        self._pending: 'OrderedDict[Tuple[str, str], ProgressEvent]' = OrderedDict()
+        self._rates: Dict[str, Tuple[float, int, Optional[float]]] = {}  # 文件 -> (时间, 字节数, 速度)
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, callback: Callable[[ProgressEvent], None]) -> Callable[[], None]:
+        """订阅进度事件（在分发线程中调用），返回取消订阅的函数"""
+        with self._condition:
+            self._subscribers.append(callback)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name='progress', daemon=True)
+                self._thread.start()
+
+        def unsubscribe():
+            with self._condition:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def publish(self, event: ProgressEvent):
+        """发布进度事件；没有给出速度时按同一文件的上一次进度估算"""
+        with self._condition:
+            if not self._subscribers:
+                return
+            if event.speed is None and event.stage == 'progress':
+                event.speed = self._estimate_speed(event)
+            if event.stage in ('done', 'failed', 'cancelled'):
+                self._rates.pop(event.filename, None)
+            self._pending.pop((event.filename, event.stage), None)
+            self._pending[(event.filename, event.stage)] = event
+            self._condition.notify()
+
+    def report(self, filename: str, backend: str, stage: str, downloaded: int = 0, total: Optional[int] = None,
+               speed: Optional[float] = None):
+        """publish 的简写"""
+        if self._subscribers:
+            self.publish(ProgressEvent(filename, backend, stage, downloaded, total, speed))
+
+    def _estimate_speed(self, event: ProgressEvent) -> Optional[float]:
+        now = time.monotonic()
+        last = self._rates.get(event.filename)
+        if last is None or event.downloaded < last[1]:
+            self._rates[event.filename] = (now, event.downloaded, None)
+            return None
+        last_time, last_bytes, speed = last
+        if now - last_time < 0.5:
+            return speed
+        current = (event.downloaded - last_bytes) / (now - last_time)
+        # 指数平均，避免分块到达不均匀时速度跳动
+        speed = current if speed is None else speed * 0.7 + current * 0.3
+        self._rates[event.filename] = (now, event.downloaded, speed)
+        return speed
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                events = list(self._pending.values())
+                self._pending.clear()
+                subscribers = list(self._subscribers)
+            for event in events:
+                for callback in subscribers:
+                    try:
+                        callback(event)
+                    except Exception as e:
+                        logger.debug(f"Progress subscriber failed: {str(e)}")
+
+
+def parse_you_get_progress(line: str) -> Optional[Tuple[int, Optional[int], Optional[float]]]:
+    """解析 you_get 的进度条，返回 (已下载字节数, 总字节数, 速度)，不是进度行时返回 None"""
+    match = YOU_GET_PROGRESS.search(line)
+    if not match:
+        return None
+    unit = UNITS[match.group('size_unit').upper()]
+    total = int(float(match.group('total')) * unit)
+    downloaded = int(float(match.group('done')) * unit)
+    speed = None
+    if match.group('speed'):
+        speed = float(match.group('speed')) * UNITS[match.group('speed_unit').upper()]
+    return downloaded, total or None, speed
+
+
+def _read_chunks(process: subprocess.Popen) -> Iterator[Tuple[str, Optional[bytes]]]:
+    """同时读取 stdout 和 stderr，产出 (流名称, 数据)，数据为 None 表示该流结束"""
+    pipes = [(name, pipe) for name, pipe in (('stdout', process.stdout), ('stderr', process.stderr)) if pipe]
+    if os.name != 'nt':
+        with selectors.DefaultSelector() as selector:
+            for name, pipe in pipes:
+                selector.register(pipe, selectors.EVENT_READ, name)
+            while selector.get_map():
+                for key, _ in selector.select():
+                    chunk = os.read(key.fd, 65536)
+                    if not chunk:
+                        selector.unregister(key.fileobj)
+                        yield key.data, None
+                    else:
+                        yield key.data, chunk
+        return
+
+    # Windows 的管道不支持 select，每个管道一个读取线程
+    chunks: queue.Queue = queue.Queue()
+
+    def read(name, pipe):
+        for chunk in iter(lambda: pipe.read1(65536), b''):
+            chunks.put((name, chunk))
+        chunks.put((name, None))
+
+    for name, pipe in pipes:
+        threading.Thread(target=read, args=(name, pipe), name=f'{name}-reader', daemon=True).start()
+    remaining = len(pipes)
+    while remaining:
+        name, chunk = chunks.get()
+        if chunk is None:
+            remaining -= 1
+        yield name, chunk
+
+
+def iter_output_lines(process: subprocess.Popen) -> Iterator[Tuple[str, str]]:
+    """非阻塞地读取子进程的 stdout 和 stderr，按行产出 (流名称, 行)
+
+    两个管道同时读取，任何一个写满都不会卡住子进程；按 \\r 或 \\n 分行，
+    进度条用 \\r 刷新同一行时每次刷新都是一行。子进程需以二进制模式打开管道。
+    """
+    buffers: Dict[str, bytes] = {}
+    for name, chunk in _read_chunks(process):
+        if chunk is None:
+            rest = buffers.pop(name, b'').strip()
+            if rest:
+                yield name, rest.decode('utf-8', errors='replace')
+            continue
+        *lines, buffers[name] = LINE_BREAK.split(buffers.get(name, b'') + chunk)
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield name, line.decode('utf-8', errors='replace')
@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import re
+import shutil
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+# 比赛目录: 1月5号灰熊vs勇士，rename_game_dirs.py 处理后为 9973_1月5号_灰熊vs勇士
+GAME_DIR_PATTERN = re.compile(r'^(?:\d{4}_)?(\d{1,2})月(\d{1,2})号')
+
+
+def directory_size(path: str) -> int:
+    """递归统计目录中文件的总字节数"""
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        total += directory_size(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return total
+
+
+def game_date(name: str, mtime: float) -> Optional[date]:
+    """从目录名解析比赛日期，年份按目录的修改时间推断（跨年时 12 月的比赛在 1 月创建）"""
+    match = GAME_DIR_PATTERN.match(name)
+    if not match:
+        return None
+    modified = datetime.fromtimestamp(mtime).date()
+    try:
+        resolved = date(modified.year, int(match.group(1)), int(match.group(2)))
+        if resolved > modified + timedelta(days=1):
+            resolved = date(modified.year - 1, resolved.month, resolved.day)
+        return resolved
+    except ValueError:
+        return None
+
+
+class RetentionManager:
+    """按磁盘预算清理最早的比赛目录
+
+    在下载目录中保存比赛目录的索引（大小、修改时间、比赛日期），每次只重新统计
+    修改时间变化过的目录。下载开始前按总字节预算、剩余空间下限和目录数上限
+    删除最早的比赛，并为本轮要下载的比赛预留空间。
+    """
+
+    INDEX_NAME = '.retention_index.json'
+
+    def __init__(self, root_dir: str, max_bytes: int = 0, min_free_bytes: int = 0, max_dirs: int = 0,
+                 index_path: Optional[str] = None):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes  # 比赛目录总大小上限，0 表示不限制
+        self.min_free_bytes = min_free_bytes  # 磁盘剩余空间下限，0 表示不限制
+        self.max_dirs = max_dirs  # 比赛目录数上限，0 表示不限制
+        self.index_path = index_path or os.path.join(root_dir, self.INDEX_NAME)
+        self.index: Dict[str, Dict[str, Any]] = self._load_index()
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.warning(f"保存目录索引失败: {str(e)}")
+
+    def scan(self) -> List[Dict[str, Any]]:
+        """更新索引并返回所有比赛目录，最早的比赛在前"""
+        index = {}
+        rescanned = 0
+        try:
+            with os.scandir(self.root_dir) as entries:
+                for entry in entries:
+                    if not GAME_DIR_PATTERN.match(entry.name) or not entry.is_dir(follow_symlinks=False):
+                        continue
+                    mtime = entry.stat(follow_symlinks=False).st_mtime
+                    cached = self.index.get(entry.name)
+                    if cached and cached['mtime'] == mtime:
+                        index[entry.name] = cached
+                        continue
+                    resolved = game_date(entry.name, mtime)
+                    index[entry.name] = {
+                        'bytes': directory_size(entry.path),
+                        'mtime': mtime,
+                        'date': resolved.isoformat() if resolved else None,
+                    }
+                    rescanned += 1
+        except FileNotFoundError:
+            pass
+        logger.debug(f"Retention index: {len(index)} directories, {rescanned} rescanned")
+        self.index = index
+        self._save_index()
+        return sorted(
+            ({'name': name, **info} for name, info in index.items()),
+            key=lambda item: (item['date'] or '', item['mtime'])
+        )
+
+    def average_dir_bytes(self) -> int:
+        """已有比赛目录的平均大小，用于估算本轮需要的空间"""
+        sizes = [info['bytes'] for info in self.index.values() if info['bytes']]
+        return sum(sizes) // len(sizes) if sizes else 0
+
+    def free_bytes(self) -> int:
+        """下载卷的剩余空间，不限制剩余空间时不查询"""
+        return shutil.disk_usage(self.root_dir).free if self.min_free_bytes else 0
+
+    def enforce(self, upcoming: Iterable[str] = ()) -> List[str]:
+        """删除最早的比赛目录直到满足预算，返回删除的目录名
+
+        upcoming 是本轮要下载的比赛目录名，这些目录不会被删除，并按平均大小为其预留空间
+        """
+        dirs = self.scan()
+        upcoming = set(upcoming)
+        average = self.average_dir_bytes()
+        reserve = sum(max(average - self.index.get(name, {}).get('bytes', 0), 0) for name in upcoming)
+
+        used = sum(item['bytes'] for item in dirs)
+        free = self.free_bytes()
+        count = len(dirs) + len([name for name in upcoming if name not in self.index])
+        # 可删除目录的总大小，是删除后最多能腾出的空间（镜像订阅的硬链接删除后不一定释放空间）
+        deletable = sum(item['bytes'] for item in dirs if item['name'] not in upcoming)
+
+        removed = []
+        for item in dirs:
+            over_budget = self.max_bytes and used + reserve > self.max_bytes
+            low_space = self.min_free_bytes and free - reserve < self.min_free_bytes
+            too_many = self.max_dirs and count > self.max_dirs
+            if low_space and not (over_budget or too_many) and \
+                    free + deletable - reserve < self.min_free_bytes:
+                # 空间被其他文件占用，删光所有比赛目录也达不到下限，不再删除
+                logger.warning("剩余空间不足，但删除旧比赛目录也无法达到下限，停止清理")
+                break
+            if not (over_budget or low_space or too_many):
+                break
+            if item['name'] in upcoming:
+                continue
+            try:
+                shutil.rmtree(os.path.join(self.root_dir, item['name']))
+            except OSError as e:
+                logger.error(f"删除目录失败 {item['name']}: {str(e)}")
+                deletable -= item['bytes']
+                continue
+            logger.info(f"已删除旧目录: {item['name']} ({item['bytes'] / 1024 / 1024 / 1024:.2f}GB)")
+            removed.append(item['name'])
+            self.index.pop(item['name'], None)
+            used -= item['bytes']
+            deletable -= item['bytes']
+            free = self.free_bytes()  # 按实际释放的空间计算
+            count -= 1
+
+        if removed:
+            self._save_index()
+        if (self.max_bytes and used + reserve > self.max_bytes) or \
+                (self.min_free_bytes and free - reserve < self.min_free_bytes):
+            logger.warning(f"清理后空间仍不足，本轮预计需要 {reserve / 1024 / 1024 / 1024:.2f}GB")
+        return removed
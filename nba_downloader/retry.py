@@ -0,0 +1,139 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+PERMANENT = 'permanent'  # 重试也不会成功：链接失效、视频已删除
+THROTTLED = 'throttled'  # 服务器限流：等待更久再重试，遵守 Retry-After
+TRANSIENT = 'transient'  # 临时错误：连接重置、超时、5xx
+
+PERMANENT_STATUS = {400, 404, 410, 451}
+THROTTLED_STATUS = {429, 503, 509}
+
+
+class PermanentError(Exception):
+    """重试也不会成功的下载错误"""
+
+
+def classify(error: Optional[BaseException]) -> str:
+    """把下载失败分为 permanent / throttled / transient，未知错误按临时错误处理"""
+    if isinstance(error, PermanentError):
+        return PERMANENT
+    response = getattr(error, 'response', None)
+    if isinstance(error, requests.HTTPError) and response is not None:
+        if response.status_code in THROTTLED_STATUS:
+            return THROTTLED
+        if response.status_code in PERMANENT_STATUS:
+            return PERMANENT
+    return TRANSIENT
+
+
+def retry_after(error: Optional[BaseException]) -> Optional[float]:
+    """从响应的 Retry-After（秒数或 HTTP 日期）得到需要等待的秒数"""
+    response = getattr(error, 'response', None)
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """按错误类型决定是否重试和等待多久：指数退避加全抖动（0 到退避上限之间随机），
+    限流时以更长的间隔退避并遵守 Retry-After"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 5, max_delay: float = 300,
+                 throttled_delay: float = 30):
+        self.max_attempts = max(max_attempts, 1)  # 包括第一次在内的最大尝试次数
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.throttled_delay = throttled_delay
+
+    def should_retry(self, kind: str, attempt: int) -> bool:
+        """第 attempt 次尝试失败后是否继续重试"""
+        return kind != PERMANENT and attempt < self.max_attempts
+
+    def delay(self, kind: str, attempt: int, wait: Optional[float] = None) -> float:
+        """第 attempt 次尝试失败后的等待秒数，wait 为服务器要求的等待时间"""
+        base = self.throttled_delay if kind == THROTTLED else self.base_delay
+        if wait is not None:
+            # 在服务器要求的时间之后再错开一点，避免所有下载同时重试
+            return wait + random.uniform(0, base)
+        return random.uniform(0, min(self.max_delay, base * 2 ** (attempt - 1)))
+
+
+class _HostState:
+    __slots__ = ('failures', 'open_until', 'probing')
+
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+
+class CircuitBreaker:
+    """按主机熔断：连续失败达到阈值后在 reset_timeout 内直接拒绝该主机的下载，
+    之后放行一个试探下载，成功则恢复，失败则再次熔断"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 300):
+        self.failure_threshold = failure_threshold  # 0 表示不熔断
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, _HostState] = {}
+
+    def allow(self, host: str) -> bool:
+        """是否允许向该主机发起下载"""
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or not state.open_until:
+                return True
+            if time.monotonic() < state.open_until or state.probing:
+                return False
+            state.probing = True  # 熔断时间已过，放行一个试探下载
+            return True
+
+    def release(self, host: str):
+        """试探下载没有结果（如被取消）时放行下一个试探"""
+        with self._lock:
+            state = self._hosts.get(host)
+            if state:
+                state.probing = False
+
+    def record_success(self, host: str):
+        """主机正常响应（包括链接失效这类与主机无关的错误）"""
+        with self._lock:
+            state = self._hosts.pop(host, None)
+        if state and state.open_until:
+            logger.info(f"{host} 已恢复")
+
+    def record_failure(self, host: str):
+        with self._lock:
+            state = self._hosts.setdefault(host, _HostState())
+            state.failures += 1
+            # 试探失败时总是再次熔断（即使不按失败次数熔断，trip 打开的熔断也要能恢复试探）
+            if state.probing or (self.failure_threshold and state.failures >= self.failure_threshold):
+                self._open(state, self.reset_timeout)
+                logger.warning(f"{host} 连续失败 {state.failures} 次，{self.reset_timeout:.0f} 秒内暂停下载")
+
+    def trip(self, host: str, duration: float):
+        """立即熔断 duration 秒（如服务器要求等待的时间过长）"""
+        with self._lock:
+            self._open(self._hosts.setdefault(host, _HostState()), duration)
+        logger.warning(f"{host} 要求等待 {duration:.0f} 秒，暂停下载")
+
+    @staticmethod
+    def _open(state: _HostState, duration: float):
+        state.open_until = max(state.open_until, time.monotonic() + duration)
+        state.probing = False
@@ -1,109 +1,344 @@
 import os
+import json
 import logging
 import subprocess
 import sys
+import threading
 import time
-from typing import Optional, Dict, Any
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Sequence, Callable, List, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from nba_downloader.retry import CircuitBreaker, RetryPolicy, PERMANENT, THROTTLED, TRANSIENT, classify, retry_after
+from nba_downloader.progress import ProgressEvent, ProgressHub, iter_output_lines, parse_you_get_progress
+from nba_downloader.weibo import WeiboDownloader, DownloadCancelled, quality_chain
 
 logger = logging.getLogger(__name__)
 
+
+class HostLimiter:
+    """按主机限制并发连接数（分段下载的每一段各占一个名额）"""
+
+    def __init__(self, max_per_host: int):
+        self.max_per_host = max(1, max_per_host)
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            sem = self._semaphores.get(host)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self.max_per_host)
+                self._semaphores[host] = sem
+            return sem
+
+    @contextmanager
+    def slot(self, url: str):
+        """占用目标主机的一个连接名额"""
+        sem = self._semaphore(urlparse(url).netloc.lower())
+        sem.acquire()
+        try:
+            yield
+        finally:
+            sem.release()
+
+
 class VideoDownloader:
-    def __init__(self, download_dir: str, quality_config: Dict[str, str], max_retries: int = 3, retry_delay: int = 5):
+    def __init__(self, download_dir: str, quality_config: Dict[str, str], max_retries: int = 3, retry_delay: int = 5,
+                 max_connections_per_host: int = 3, session: Optional[requests.Session] = None,
+                 backends: Sequence[str] = ('native', 'you_get'), chunk_size: int = 1024 * 1024,
+                 segments: int = 1, min_segment_size: int = 16 * 1024 * 1024,
+                 throttle: Optional[Callable[[int], None]] = None, quality_fallback: Sequence[str] = (),
+                 format_cache=None, format_cache_ttl: int = 6 * 60 * 60,
+                 retry_policy: Optional[RetryPolicy] = None, circuit_breaker: Optional[CircuitBreaker] = None):
         self.download_dir = download_dir
         self.quality_config = quality_config
         self.you_get_path = sys.executable
-        self.max_retries = max_retries  # 最大重试次数
-        self.retry_delay = retry_delay  # 重试间隔（秒）
+        # 按错误类型重试（链接失效不重试，限流时退避更久），未指定时按 max_retries / retry_delay 指数退避
+        self.retry_policy = retry_policy or RetryPolicy(max_retries, retry_delay)
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()  # 按主机熔断
+        # 按实际提供视频流的主机（而不是所有视频共用的 weibo.com 页面主机）限制并发连接数
+        self.host_limiter = HostLimiter(max_connections_per_host)
+        self.quality_fallback = list(quality_fallback)  # 清晰度降级顺序
+        self.format_cache = format_cache  # 每个链接可用清晰度的缓存（DownloadLedger），None 时不缓存
+        self.format_cache_ttl = format_cache_ttl
+        self.backends = list(backends)  # 按顺序尝试的下载后端: 'native'（进程内）, 'you_get'（子进程）
+        self.cancel_event = threading.Event()  # 取消后不再开始新的下载，进行中的下载保存进度后停止
+        self._processes = set()  # 正在运行的 you_get 子进程
+        self._processes_lock = threading.Lock()
+        self.progress = ProgressHub()  # 下载进度事件，见 subscribe
+        self._last_progress_log: Dict[str, float] = {}
+        self.progress.subscribe(self._log_progress)
+        self.weibo = WeiboDownloader(
+            session or requests.Session(), chunk_size=chunk_size,
+            segments=segments, min_segment_size=min_segment_size, throttle=throttle,
+            cancel_event=self.cancel_event, quality_fallback=self.quality_fallback,
+            connection_slot=self.host_limiter.slot,
+            progress=lambda filename, downloaded, total: self.progress.report(
+                filename, 'native', 'progress', downloaded, total)
+        )
+
+    def subscribe(self, callback: Callable[[ProgressEvent], None]) -> Callable[[], None]:
+        """订阅下载进度事件（在单独的线程中回调，不影响下载速度），返回取消订阅的函数"""
+        return self.progress.subscribe(callback)
+
+    def _log_progress(self, event: ProgressEvent):
+        """每个文件每 15 秒输出一次进度"""
+        if event.stage != 'progress':
+            self._last_progress_log.pop(event.filename, None)
+            return
+        now = time.monotonic()
+        if now - self._last_progress_log.setdefault(event.filename, now) < 15:
+            return
+        self._last_progress_log[event.filename] = now
+        message = f"{event.filename} - {event.downloaded / 1024 / 1024:.1f}MB"
+        if event.total:
+            message += f" / {event.total / 1024 / 1024:.1f}MB ({event.percent:.1f}%)"
+        if event.speed:
+            message += f", {event.speed / 1024 / 1024:.2f}MB/s"
+        logger.info(message)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        """取消所有下载：进程内下载在下一块数据处停止并保留 .part，you_get 子进程被终止"""
+        self.cancel_event.set()
+        with self._processes_lock:
+            processes = list(self._processes)
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+
+    @staticmethod
+    def find_output_file(output_dir: str, filename: str) -> Optional[str]:
+        """查找已下载完成的视频文件（扩展名由下载工具决定），未找到返回 None"""
+        try:
+            with os.scandir(output_dir) as entries:
+                for entry in entries:
+                    stem, ext = os.path.splitext(entry.name)
+                    if stem == filename and ext not in ('.download', '.part') and entry.is_file():
+                        return entry.path
+        except FileNotFoundError:
+            pass
+        return None
 
     def download(self, video_info: Dict[str, Any], output_dir: str, filename: str, quality: str) -> bool:
-        retries = 0
-        while retries < self.max_retries:
-            try:
-                if not os.path.exists(output_dir):
-                    os.makedirs(output_dir)
-
-                if retries > 0:
-                    logger.info(f"第 {retries} 次重试下载: {filename}")
-                    time.sleep(self.retry_delay)  # 重试前等待
-                else:
-                    logger.info(f"开始下载: {filename}")
-                
-                if video_info['type'] != 'weibo':
-                    logger.error(f"不支持的视频类型: {video_info['type']}")
-                    return False
+        if self.cancelled:  # 排队期间可能已被取消
+            return False
+        if video_info['type'] != 'weibo':
+            logger.error(f"不支持的视频类型: {video_info['type']}")
+            return False
 
-                # 构建下载命令
-                cmd = [
-                    self.you_get_path,
-                    '-m', 'you_get',
-                    '-o', output_dir,
-                    '-O', filename
-                ]
-                
-                # 添加清晰度参数
-                quality_arg = self.quality_config.get(quality, '')
-                if quality_arg:
-                    cmd.append(quality_arg)
-                
-                cmd.append(video_info['url'])
-                
-                # 使用 Popen 来实时获取输出
-                process = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    universal_newlines=True,
-                    bufsize=1
-                )
-
-                last_log_time = 0
-                downloading = False
-
-                while True:
-                    output = process.stdout.readline()
-                    if output == '' and process.poll() is not None:
-                        break
-                    
-                    output = output.strip()
-                    if output:
-                        current_time = time.time()
-                        
-                        # 检测下载开始
-                        if 'Downloading' in output:
-                            downloading = True
-                            last_log_time = current_time
-                            logger.info(f"{filename} - {output}")
-                            continue
-                        
-                        # 只在下载过程中每15秒输出一次进度
-                        if downloading and current_time - last_log_time >= 15:
-                            # 只输出包含进度信息的行
-                            if '%' in output:
-                                logger.info(f"{filename} - {output}")
-                                last_log_time = current_time
-
-                # 检查下载结果
-                return_code = process.poll()
-                if return_code == 0:
+        attempt = 0
+        while True:
+            host, stream = self._stream_host(video_info, quality)
+            if not self.circuit_breaker.allow(host):
+                logger.error(f"{host} 暂停下载中，跳过: {filename}")
+                return False
+            os.makedirs(output_dir, exist_ok=True)
+            attempt += 1
+            logger.info(f"开始下载: {filename}" if attempt == 1 else f"第 {attempt - 1} 次重试下载: {filename}")
+
+            # 依次尝试各个下载后端，前一个失败时使用下一个；链接失效或被限流时其他后端也不会成功
+            error = None
+            kind = None
+            for backend in self.backends:
+                if backend not in ('native', 'you_get'):
+                    logger.error(f"未知的下载后端: {backend}")
+                    continue
+                self.progress.report(filename, backend, 'start')
+                try:
+                    if backend == 'native':
+                        self.weibo.download(video_info, output_dir, filename, quality, stream)
+                    elif self._you_get_with_slot(video_info, output_dir, filename, quality, stream):
+                        # you_get 从头下载，进程内下载留下的进度已无用
+                        self.weibo.discard_part(output_dir, filename)
+                    else:
+                        self.progress.report(filename, backend, 'failed')
+                        if kind is None:
+                            error, kind = None, classify(None)
+                        continue
+                    self.progress.report(filename, backend, 'done')
+                    self.circuit_breaker.record_success(host)
                     logger.info(f"下载完成: {filename}")
                     return True
-                else:
-                    logger.error(f"下载失败 {filename}, 错误码: {return_code}")
-                    retries += 1
-                    continue
-                
-            except subprocess.CalledProcessError as e:
-                logger.error(f"下载出错: {str(e)}")
-                retries += 1
-                continue
-                
-            except Exception as e:
-                logger.error(f"下载异常: {str(e)}")
-                retries += 1
-                continue
+                except DownloadCancelled:
+                    self.progress.report(filename, backend, 'cancelled')
+                    self.circuit_breaker.release(host)
+                    logger.info(f"下载已取消，进度已保存: {filename}")
+                    return False
+                except Exception as e:
+                    self.progress.report(filename, backend, 'failed')
+                    error, kind = e, classify(e)
+                    logger.error(f"下载异常 ({backend}, {kind}) {filename}: {str(e)}")
+                    # 服务器返回 404 / 410 或限流时其他后端也不会成功；本地无法解析的链接交给下一个后端。
+                    # 临时错误（连接中断、超时）按重试策略重试同一后端，从 .part 续传并受带宽限制，
+                    # 重试次数用完后才交给下一个后端
+                    if kind == THROTTLED or (kind == PERMANENT and isinstance(e, requests.HTTPError)):
+                        break
+                    if kind == TRANSIENT and self.retry_policy.should_retry(kind, attempt):
+                        break
+                if self.cancelled:
+                    self.circuit_breaker.release(host)
+                    return False
+
+            if kind is None:
+                self.circuit_breaker.release(host)
+                return False  # 没有可用的下载后端
+            if kind == PERMANENT:
+                self.circuit_breaker.record_success(host)  # 主机正常，只是链接失效
+                logger.error(f"链接已失效，不再重试: {filename}")
+                return False
+            self.circuit_breaker.record_failure(host)
+            if not self.retry_policy.should_retry(kind, attempt):
+                logger.error(f"达到最大重试次数 ({self.retry_policy.max_attempts})，放弃下载: {filename}")
+                return False
+
+            wait = retry_after(error)
+            if wait is not None and wait > self.retry_policy.max_delay:
+                # 服务器要求等待太久，不占用下载线程，该主机的其他下载也暂停
+                self.circuit_breaker.trip(host, wait)
+                logger.error(f"服务器要求 {wait:.0f} 秒后重试，放弃本次下载: {filename}")
+                return False
+            delay = self.retry_policy.delay(kind, attempt, wait)
+            logger.info(f"{delay:.1f} 秒后重试: {filename}")
+            if self.cancel_event.wait(delay):  # 重试前等待，取消时立即返回
+                self.circuit_breaker.release(host)
+                return False
+
+    def _stream_host(self, video_info: Dict[str, Any], quality: str) -> Tuple[str, Optional[Tuple[str, str]]]:
+        """熔断按实际提供视频流的主机计算（所有微博视频的页面都在 weibo.com 上），返回 (主机, 已解析的流)
+
+        只用 you_get 时无法得知流地址，按页面主机计算；解析失败时按接口主机计算，
+        错误在 native 后端重新解析时按原样处理
+        """
+        if 'native' not in self.backends:
+            return urlparse(video_info['url']).netloc.lower(), None
+        try:
+            stream = self.weibo.resolve_stream(video_info['url'], quality)
+        except Exception:
+            return urlparse(self.weibo.API_URL).netloc.lower(), None
+        return urlparse(stream[1]).netloc.lower(), stream
+
+    def probe_you_get_formats(self, url: str) -> Optional[List[str]]:
+        """用 you_get --json 列出链接可用的格式（如 dash-flv720），失败时返回 None"""
+        try:
+            result = subprocess.run(
+                [self.you_get_path, '-m', 'you_get', '--json', url],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=60
+            )
+            if result.returncode != 0:
+                logger.debug(f"you_get 格式探测失败 ({result.returncode}): {result.stderr.strip()[-200:]}")
+                return None
+            return list(json.loads(result.stdout).get('streams') or {})
+        except (subprocess.TimeoutExpired, ValueError, OSError) as e:
+            logger.debug(f"you_get 格式探测失败: {str(e)}")
+            return None
+
+    def available_qualities(self, url: str) -> Optional[List[str]]:
+        """you_get 可以下载的清晰度（QUALITY 配置中的名称），按链接缓存；探测失败时返回 None"""
+        if self.format_cache:
+            cached = self.format_cache.get_formats(url, 'you_get', self.format_cache_ttl)
+            if cached is not None:
+                return cached
+
+        formats = self.probe_you_get_formats(url)
+        if formats is None:
+            return None
+        qualities = [
+            quality for quality, arg in self.quality_config.items()
+            if arg.split('=', 1)[-1] in formats
+        ]
+        logger.debug(f"you_get formats for {url}: {formats} -> {qualities}")
+        if self.format_cache:
+            self.format_cache.save_formats(url, 'you_get', qualities)
+        return qualities
+
+    def select_you_get_quality_arg(self, url: str, quality: str) -> str:
+        """按降级顺序选择 you_get 实际提供的清晰度参数
+
+        都不提供时不指定格式（由 you_get 选择），探测失败时按原样使用期望清晰度
+        """
+        available = self.available_qualities(url)
+        if available is None:
+            return self.quality_config.get(quality, '')
+        for candidate in quality_chain(quality, self.quality_fallback):
+            if candidate in available:
+                if candidate != quality:
+                    logger.info(f"没有 {quality} 格式，使用 {candidate}")
+                return self.quality_config.get(candidate, '')
+        logger.info("没有可用的配置清晰度，使用 you_get 默认格式")
+        return ''
+
+    def _you_get_with_slot(self, video_info: Dict[str, Any], output_dir: str, filename: str, quality: str,
+                           stream: Optional[Tuple[str, str]]) -> bool:
+        """you_get 子进程占用一个连接名额，按已解析的流主机计算，未解析时按页面主机"""
+        with self.host_limiter.slot(stream[1] if stream else video_info['url']):
+            if self.cancelled:  # 等待名额期间可能已被取消
+                return False
+            return self._download_you_get(video_info, output_dir, filename, quality)
+
+    def _download_you_get(self, video_info: Dict[str, Any], output_dir: str, filename: str, quality: str) -> bool:
+        """使用 you_get 子进程下载，作为进程内下载失败时的后备方案"""
+        # 构建下载命令
+        cmd = [
+            self.you_get_path,
+            '-m', 'you_get',
+            '-o', output_dir,
+            '-O', filename
+        ]
+
+        # 添加清晰度参数（只使用探测到的可用格式）
+        quality_arg = self.select_you_get_quality_arg(video_info['url'], quality)
+        if quality_arg:
+            cmd.append(quality_arg)
+
+        cmd.append(video_info['url'])
+
+        # 以二进制模式打开管道，由 iter_output_lines 非阻塞地同时读取 stdout 和 stderr
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        with self._processes_lock:
+            self._processes.add(process)
+        if self.cancelled:
+            process.terminate()
+        try:
+            return self._wait_you_get(process, filename)
+        finally:
+            with self._processes_lock:
+                self._processes.discard(process)
+
+    def _wait_you_get(self, process: subprocess.Popen, filename: str) -> bool:
+        """读取 you_get 输出直到进程结束，进度条解析为进度事件，返回是否下载成功"""
+        errors = deque(maxlen=10)  # 失败时输出 stderr 的最后几行
+        try:
+            for stream, line in iter_output_lines(process):
+                progress = parse_you_get_progress(line)
+                if progress:
+                    downloaded, total, speed = progress
+                    self.progress.report(filename, 'you_get', 'progress', downloaded, total, speed)
+                elif 'Downloading' in line:
+                    logger.info(f"{filename} - {line}")
+                elif stream == 'stderr':
+                    errors.append(line[:500])
+        finally:
+            process.stdout.close()
+            process.stderr.close()
 
-        logger.error(f"达到最大重试次数 ({self.max_retries})，放弃下载: {filename}")
-        return False
+        # 检查下载结果
+        return_code = process.wait()
+        if self.cancelled:
+            raise DownloadCancelled(f"{filename} 下载已取消")
+        if return_code != 0:
+            logger.error(f"下载失败 {filename}, 错误码: {return_code}")
+            for line in errors:
+                logger.error(f"{filename} - {line}")
+            return False
+        return True
 
     def download_videos(self, videos: list, output_dir: str, base_filename: str, quality: str) -> bool:
         """
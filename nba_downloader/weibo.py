@@ -0,0 +1,340 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, ContextManager, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urljoin
+
+import requests
+
+from nba_downloader.retry import PermanentError
+
+logger = logging.getLogger(__name__)
+
+
+def quality_chain(quality: str, fallback: Sequence[str]) -> List[str]:
+    """从期望清晰度开始的降级顺序，如 '1080p' -> ['1080p', '720p', '480p']"""
+    fallback = list(fallback)
+    if quality in fallback:
+        return fallback[fallback.index(quality):]
+    return [quality] + fallback
+
+
+class DownloadCancelled(Exception):
+    """下载被取消（如收到 SIGTERM），已写入的数据保留在 .part 中，下次继续"""
+
+
+class WeiboDownloader:
+    """进程内的微博视频下载器
+
+    通过微博 h5 接口解析视频流地址，再用共享的 requests.Session 分块下载，
+    不需要为每个视频启动 you_get 子进程。
+    """
+
+    API_URL = 'https://h5.video.weibo.com/api/component'
+    MOBILE_USER_AGENT = ('Mozilla/5.0 (Linux; Android 4.4.2; Nexus 4 Build/KOT49H) AppleWebKit/537.36 '
+                         '(KHTML, like Gecko) Chrome/34.0.1847.114 Mobile Safari/537.36')
+
+    def __init__(self, session: requests.Session, chunk_size: int = 1024 * 1024, timeout=(10, 60),
+                 segments: int = 1, min_segment_size: int = 16 * 1024 * 1024,
+                 throttle: Optional[Callable[[int], None]] = None, cancel_event: Optional[threading.Event] = None,
+                 quality_fallback: Sequence[str] = (),
+                 progress: Optional[Callable[[str, int, Optional[int]], None]] = None,
+                 connection_slot: Optional[Callable[[str], ContextManager]] = None):
+        self.session = session
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.segments = segments  # 分段下载的并发连接数，1 表示单连接
+        self.min_segment_size = min_segment_size  # 每段的最小字节数，文件太小时不分段
+        self.throttle = throttle  # 每读取一块数据调用一次，用于全局限速
+        self.cancel_event = cancel_event or threading.Event()  # 设置后正在进行的下载在下一块数据处停止
+        self.quality_fallback = list(quality_fallback)  # 清晰度降级顺序，如 ['1080p', '720p', '480p']
+        self.progress = progress  # 每写入一块数据调用 progress(文件名, 已下载字节数, 总字节数)
+        self.connection_slot = connection_slot  # 每个视频流连接占用 connection_slot(流地址)，用于按主机限制连接数
+
+    @contextmanager
+    def _connection(self, stream_url: str, filename: str):
+        """占用流所在主机的一个连接名额，等待名额期间被取消时不再发起请求"""
+        if not self.connection_slot:
+            yield
+            return
+        with self.connection_slot(stream_url):
+            if self.cancel_event.is_set():
+                raise DownloadCancelled(f"{filename} 下载已取消")
+            yield
+
+    @staticmethod
+    def extract_oid(url: str) -> Optional[str]:
+        """从微博视频链接中提取 oid（如 1034:4851234567890123）"""
+        match = re.search(r'/show/(\d{4}:\w+)', url) or re.search(r'[?&]fid=(\d{4}:\w+)', url)
+        return match.group(1) if match else None
+
+    def resolve_formats(self, url: str) -> Dict[str, str]:
+        """解析视频可用的清晰度，返回 {'高清 1080P': 流地址} 形式的字典"""
+        oid = self.extract_oid(url)
+        if not oid:
+            raise PermanentError(f"无法识别的微博视频链接: {url}")
+
+        page = f'/show/{oid}'
+        headers = {
+            'User-Agent': self.MOBILE_USER_AGENT,
+            'Origin': 'https://h5.video.weibo.com',
+            'Referer': f'https://h5.video.weibo.com{page}',
+            'page-referer': page,
+        }
+        response = self.session.post(
+            self.API_URL,
+            params={'page': page},
+            data={'data': json.dumps({'Component_Play_Playinfo': {'oid': oid}})},
+            headers=headers,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        data = response.json()
+        if data.get('msg') != 'succ':
+            raise RuntimeError(f"微博接口返回失败: ({data.get('code')}) {data.get('msg')}")
+
+        play_info = data['data']['Component_Play_Playinfo']
+        formats = {}
+        for label, stream_url in (play_info.get('urls') or {}).items():
+            # 接口返回的是 //f.video.weibocdn.com/... 形式的相对协议地址
+            formats[label] = urljoin(self.API_URL, stream_url)
+        if not formats:
+            raise PermanentError(f"微博视频没有可用的播放地址: {url}")
+        return formats
+
+    @staticmethod
+    def format_height(label: str) -> int:
+        """从清晰度标签（如 '高清 1080P'）中提取分辨率高度"""
+        match = re.search(r'(\d{3,4})', label)
+        return int(match.group(1)) if match else 0
+
+    def select_stream(self, formats: Dict[str, str], quality: str) -> Tuple[str, str]:
+        """按降级顺序选择第一个可用的清晰度；都没有时选择不超过期望清晰度的最高清晰度，再没有时退回最低清晰度"""
+        wanted = self.format_height(quality)
+        heights = {self.format_height(label): (label, stream_url) for label, stream_url in formats.items()}
+        for candidate in quality_chain(quality, self.quality_fallback):
+            if self.format_height(candidate) in heights:
+                return heights[self.format_height(candidate)]
+
+        ranked = sorted(formats.items(), key=lambda item: self.format_height(item[0]), reverse=True)
+        for label, stream_url in ranked:
+            if self.format_height(label) <= wanted:
+                return label, stream_url
+        return ranked[-1]
+
+    @staticmethod
+    def _load_state(state_path: str) -> Dict:
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _save_state(state_path: str, state: Dict):
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def probe_size(self, stream_url: str) -> Optional[int]:
+        """探测服务器是否支持 Range 请求，支持时返回文件总大小，否则返回 None"""
+        headers = {'User-Agent': self.MOBILE_USER_AGENT, 'Range': 'bytes=0-0'}
+        with self.session.get(stream_url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 206:
+                return None
+            match = re.match(r'bytes\s+0-0/(\d+)', response.headers.get('Content-Range', ''))
+            return int(match.group(1)) if match else None
+
+    def resolve_stream(self, url: str, quality: str) -> Tuple[str, str]:
+        """解析视频并按清晰度选择流，返回 (清晰度标签, 流地址)"""
+        return self.select_stream(self.resolve_formats(url), quality)
+
+    def download(self, video_info: Dict, output_dir: str, filename: str, quality: str,
+                 stream: Optional[Tuple[str, str]] = None) -> str:
+        """下载视频，返回保存的文件路径，失败时抛出异常；stream 为已解析的 (清晰度标签, 流地址)
+
+        数据先写入 <文件名>.part，重试或下次运行时从已写入的位置继续，
+        下载完整后才原子重命名为最终文件名。文件足够大且服务器支持 Range 时
+        分段并发下载。
+        """
+        label, stream_url = stream or self.resolve_stream(video_info['url'], quality)
+        logger.info(f"{filename} - 使用清晰度 {label}")
+
+        output_path = os.path.join(output_dir, f"{filename}.mp4")
+        part_path = f"{output_path}.part"
+        state_path = f"{part_path}.json"
+
+        # 清晰度变化时旧数据不能续传
+        state = self._load_state(state_path) if os.path.exists(part_path) else {}
+        if state and state.get('format') != label:
+            logger.info(f"{filename} - 清晰度已变化，重新下载")
+            state = {}
+
+        # 已有 .part 时按原来的方式继续下载，不混用两种方式（即使之后改了 DOWNLOAD_SEGMENTS）
+        resume_single = bool(state) and state.get('mode', 'single') == 'single'
+        resume_segmented = bool(state) and state.get('mode') == 'segmented'
+        if (self.segments > 1 or resume_segmented) and not resume_single:
+            total = self.probe_size(stream_url)
+            if total and ((resume_segmented and total == state.get('total'))
+                          or (self.segments > 1 and total >= self.min_segment_size * 2)):
+                self._download_segmented(stream_url, part_path, state_path, state, label, total, filename)
+                return self._finish(part_path, state_path, output_path)
+            # 分段下载的 .part 已预分配为完整大小，中间可能有未写入的空洞，不能单连接续传
+            state = {}
+
+        self._download_single(stream_url, part_path, state_path, state, label, filename)
+        return self._finish(part_path, state_path, output_path)
+
+    @staticmethod
+    def discard_part(output_dir: str, filename: str):
+        """删除未完成下载的 .part 和进度文件（如已由其他后端下载完成）"""
+        part_path = os.path.join(output_dir, f"{filename}.mp4.part")
+        for path in (part_path, f"{part_path}.json"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _finish(part_path: str, state_path: str, output_path: str) -> str:
+        """下载完整后原子重命名为最终文件"""
+        os.replace(part_path, output_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        return output_path
+
+    def _download_single(self, stream_url: str, part_path: str, state_path: str, state: Dict, label: str,
+                         filename: str):
+        """单连接下载，已写入的字节数就是 .part 文件的长度，用 Range 续传（只续传单连接写入的 .part）"""
+        resume = bool(state) and state.get('mode', 'single') == 'single'
+        offset = os.path.getsize(part_path) if resume and os.path.exists(part_path) else 0
+
+        headers = {'User-Agent': self.MOBILE_USER_AGENT}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+        with self._connection(stream_url, filename), \
+                self.session.get(stream_url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416 and offset:
+                if offset != state.get('total'):
+                    os.remove(part_path)
+                    raise IOError("续传位置无效，已丢弃 .part 文件")
+                # 上次已写完但还没来得及重命名
+                total = offset
+            else:
+                response.raise_for_status()
+                if offset and response.status_code == 206:
+                    logger.info(f"{filename} - 从 {offset / 1024 / 1024:.1f}MB 处继续下载")
+                    mode = 'ab'
+                else:
+                    # 服务器不支持 Range，只能从头开始
+                    offset = 0
+                    mode = 'wb'
+                length = response.headers.get('Content-Length')
+                total = offset + int(length) if length else None
+                self._save_state(state_path, {'format': label, 'mode': 'single', 'total': total})
+
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if self.cancel_event.is_set():
+                            raise DownloadCancelled(f"{filename} 下载已取消")
+                        f.write(chunk)
+                        offset += len(chunk)
+                        if self.throttle:
+                            self.throttle(len(chunk))
+                        if self.progress:
+                            self.progress(filename, offset, total)
+
+        size = os.path.getsize(part_path)
+        if total is not None and size != total:
+            raise IOError(f"下载不完整: {size}/{total} 字节")
+
+    def _download_segmented(self, stream_url: str, part_path: str, state_path: str, state: Dict, label: str,
+                            total: int, filename: str):
+        """分段并发下载：按字节范围拆分，多个连接直接写入预分配文件的对应位置"""
+        if state.get('total') == total and state.get('segments'):
+            segments = state['segments']  # [起始位置, 结束位置, 已写入字节数]
+            done = sum(segment[2] for segment in segments)
+            logger.info(f"{filename} - 从 {done / 1024 / 1024:.1f}MB 处继续分段下载")
+        else:
+            count = max(1, min(self.segments, total // self.min_segment_size))
+            step = -(-total // count)
+            segments = [[start, min(start + step, total) - 1, 0] for start in range(0, total, step)]
+            # 预分配完整大小，各分段用定位写入，下载完成后不需要再拼接
+            with open(part_path, 'wb') as f:
+                f.truncate(total)
+            if hasattr(os, 'posix_fallocate'):
+                fd = os.open(part_path, os.O_WRONLY)
+                try:
+                    os.posix_fallocate(fd, 0, total)
+                except OSError:
+                    pass  # 文件系统不支持时保持稀疏文件
+                finally:
+                    os.close(fd)
+            logger.info(f"{filename} - 分 {len(segments)} 段下载 {total / 1024 / 1024:.1f}MB")
+
+        state = {'format': label, 'mode': 'segmented', 'total': total, 'segments': segments}
+        self._save_state(state_path, state)
+        state_lock = threading.Lock()
+        last_save = [time.monotonic()]
+
+        def fetch(segment):
+            start, end, _ = segment
+            if start + segment[2] > end:
+                return
+            headers = {'User-Agent': self.MOBILE_USER_AGENT, 'Range': f'bytes={start + segment[2]}-{end}'}
+            fd = os.open(part_path, os.O_WRONLY)
+            try:
+                with self._connection(stream_url, filename), \
+                        self.session.get(stream_url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code != 206:
+                        raise IOError(f"分段请求未返回 206: {response.status_code}")
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if self.cancel_event.is_set():
+                            raise DownloadCancelled(f"{filename} 下载已取消")
+                        chunk = chunk[:end + 1 - start - segment[2]]
+                        _pwrite(fd, chunk, start + segment[2])
+                        if self.throttle:
+                            self.throttle(len(chunk))
+                        with state_lock:
+                            segment[2] += len(chunk)
+                            if self.progress:
+                                self.progress(filename, sum(item[2] for item in segments), total)
+                            # 定期记录各分段进度，用于下次续传
+                            if time.monotonic() - last_save[0] >= 1:
+                                self._save_state(state_path, state)
+                                last_save[0] = time.monotonic()
+            finally:
+                os.close(fd)
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(segments), thread_name_prefix='segment') as executor:
+                for future in [executor.submit(fetch, segment) for segment in segments]:
+                    future.result()
+        finally:
+            with state_lock:
+                self._save_state(state_path, state)
+
+        missing = [segment for segment in segments if segment[0] + segment[2] <= segment[1]]
+        if missing:
+            raise IOError(f"分段下载不完整: {len(missing)}/{len(segments)} 段未完成")
+
+
+def _pwrite(fd: int, data: bytes, offset: int):
+    """在文件指定位置写入（不移动共享的文件偏移）"""
+    if hasattr(os, 'pwrite'):
+        while data:
+            written = os.pwrite(fd, data, offset)
+            data = data[written:]
+            offset += written
+    else:
+        # Windows 没有 pwrite，每个分段使用独立的文件描述符，seek 后写入是安全的
+        os.lseek(fd, offset, os.SEEK_SET)
+        while data:
+            written = os.write(fd, data)
+            data = data[written:]
@@ -3,7 +3,8 @@ import os
 from datetime import datetime, timedelta
 import argparse
 import re
-import shutil
+
+from nba_downloader.retention import RetentionManager
 
 def get_sort_prefix(date_str):
     # 从日期字符串中提取月份和日期
@@ -20,28 +21,9 @@ def get_sort_prefix(date_str):
     return f"{prefix:04d}"
 
 def cleanup_old_directories(root_dir, max_dirs=50):
-    """清理旧的目录，保持总数不超过最大限制"""
-    # 获取所有目录
-    dirs = [d for d in os.listdir(root_dir) if os.path.isdir(os.path.join(root_dir, d))]
-    
-    # 如果目录数量未超过限制，无需清理
-    if len(dirs) <= max_dirs:
-        return
-    
-    # 按照排序前缀排序（较大的前缀代表较早的日期）
-    dirs.sort(key=lambda x: x.split('_')[0] if x.split('_')[0].isdigit() else "0000", reverse=True)
-    
-    # 需要删除的目录数量
-    dirs_to_remove = len(dirs) - max_dirs
-    
-    # 删除前缀最大的几个目录（最早的比赛）
-    for dir_to_remove in dirs[:dirs_to_remove]:
-        dir_path = os.path.join(root_dir, dir_to_remove)
-        try:
-            shutil.rmtree(dir_path)
-            print(f"\n已删除旧目录: {dir_to_remove}")
-        except Exception as e:
-            print(f"\n删除目录失败 {dir_to_remove}: {str(e)}")
+    """清理旧的目录，保持总数不超过最大限制（按比赛日期而不是排序前缀判断新旧，跨年也正确）"""
+    for removed in RetentionManager(root_dir, max_dirs=max_dirs).enforce():
+        print(f"\n已删除旧目录: {removed}")
 
 def rename_game_directories(debug_mode=False):
     # 获取前一天的日期，格式化为"X月X号"的形式
@@ -8,10 +8,16 @@ setup(
         "requests>=2.31.0",
         "beautifulsoup4>=4.12.2",
         "selenium>=4.15.2",
-        "tqdm>=4.66.1",
         "you-get>=0.4.1650",
         "webdriver-manager>=4.0.1",
     ],
+    extras_require={
+        # 更快的 HTML 解析后端，未安装时使用 BeautifulSoup
+        'fast': [
+            "lxml>=4.9.0",
+            "selectolax>=0.3.17",
+        ],
+    },
     entry_points={
         'console_scripts': [
             'nba-downloader=nba_downloader.nba_video_downloader:main',